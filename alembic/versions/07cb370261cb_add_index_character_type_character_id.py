@@ -0,0 +1,33 @@
+"""add index character_type character_id
+
+Revision ID: 07cb370261cb
+Revises: 3c88b2347264
+Create Date: 2026-10-17 10:12:31.482615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '07cb370261cb'
+down_revision: Union[str, Sequence[str], None] = '3c88b2347264'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_character_character_type_character_id',
+        'character',
+        ['character_type', 'character_id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_character_character_type_character_id', table_name='character')
@@ -0,0 +1,33 @@
+"""add index characterpower power_id
+
+Revision ID: 5d068450f9ea
+Revises: cfd80ba9fb6d
+Create Date: 2026-10-17 16:35:12.840417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d068450f9ea'
+down_revision: Union[str, Sequence[str], None] = 'cfd80ba9fb6d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_characterpower_power_id_character_id',
+        'characterpower',
+        ['power_id', 'character_id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_characterpower_power_id_character_id', table_name='characterpower')
@@ -0,0 +1,55 @@
+"""add character search indexes
+
+Revision ID: 7b65036140f2
+Revises: f3c5213600a1
+Create Date: 2026-10-17 14:22:08.305114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b65036140f2'
+down_revision: Union[str, Sequence[str], None] = 'f3c5213600a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_character_name_trgm',
+        'character',
+        ['name'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_character_secret_name_trgm',
+        'character',
+        ['secret_name'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'secret_name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_character_search_document',
+        'character',
+        [sa.text(
+            "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(secret_name, ''))"
+        )],
+        unique=False,
+        postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_character_search_document', table_name='character')
+    op.drop_index('ix_character_secret_name_trgm', table_name='character')
+    op.drop_index('ix_character_name_trgm', table_name='character')
@@ -0,0 +1,54 @@
+"""create table characterpowerstats
+
+Revision ID: b982ebe623fd
+Revises: 5d068450f9ea
+Create Date: 2026-10-17 17:20:44.519306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b982ebe623fd'
+down_revision: Union[str, Sequence[str], None] = '5d068450f9ea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('characterpowerstats',
+    sa.Column('character_id', sa.Integer(), nullable=False),
+    sa.Column('power_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('total_damage', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('max_damage', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['character_id'], ['character.character_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('character_id')
+    )
+    op.create_index(
+        'ix_characterpowerstats_total_damage_character_id',
+        'characterpowerstats',
+        ['total_damage', 'character_id'],
+        unique=False
+    )
+    # Stats of the existing characters
+    op.execute(
+        "INSERT INTO characterpowerstats (character_id, power_count, total_damage, max_damage) "
+        "SELECT c.character_id, count(p.power_id), coalesce(sum(p.power_damage), 0), "
+        "coalesce(max(p.power_damage), 0) "
+        "FROM \"character\" c "
+        "LEFT JOIN characterpower cp ON cp.character_id = c.character_id "
+        "LEFT JOIN powers p ON p.power_id = cp.power_id "
+        "GROUP BY c.character_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'ix_characterpowerstats_total_damage_character_id', table_name='characterpowerstats'
+    )
+    op.drop_table('characterpowerstats')
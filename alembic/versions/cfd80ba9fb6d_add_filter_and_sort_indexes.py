@@ -0,0 +1,44 @@
+"""add filter and sort indexes
+
+Revision ID: cfd80ba9fb6d
+Revises: 7b65036140f2
+Create Date: 2026-10-17 15:40:51.226873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cfd80ba9fb6d'
+down_revision: Union[str, Sequence[str], None] = '7b65036140f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_character_age', 'character', ['age'], unique=False)
+    op.create_index(
+        'ix_powers_power_damage_power_id',
+        'powers',
+        ['power_damage', 'power_id'],
+        unique=False
+    )
+    op.create_index(
+        'ix_powers_power_name_trgm',
+        'powers',
+        ['power_name'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'power_name': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_powers_power_name_trgm', table_name='powers')
+    op.drop_index('ix_powers_power_damage_power_id', table_name='powers')
+    op.drop_index('ix_character_age', table_name='character')
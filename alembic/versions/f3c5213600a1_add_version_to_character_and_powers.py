@@ -0,0 +1,36 @@
+"""add version to character and powers
+
+Revision ID: f3c5213600a1
+Revises: 07cb370261cb
+Create Date: 2026-10-17 11:03:52.917240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c5213600a1'
+down_revision: Union[str, Sequence[str], None] = '07cb370261cb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'character',
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False)
+    )
+    op.add_column(
+        'powers',
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('powers', 'version')
+    op.drop_column('character', 'version')
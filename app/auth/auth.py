@@ -5,7 +5,11 @@
 ###################################################################################################
 # Imports
 import os
+import time
+import hashlib
+import threading
 import jwt
+from collections import OrderedDict
 from jwt.exceptions import InvalidTokenError
 from typing import Annotated
 from pathlib import Path
@@ -62,14 +66,64 @@ def get_access_token(data: dict, expiration: timedelta | None = None):
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 ###################################################################################################
 
+###################################################################################################
+# Verified tokens cache
+
+# Maximum number of verified tokens kept in memory (0 disables the cache)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))
+
+# sha256(token) -> (exp timestamp, payload), in least recently used order
+_verified_tokens: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+_verified_tokens_lock = threading.Lock()
+
+
+def decode_token(token: str) -> dict:
+
+    """ Function to decode and verify a JWT. Tokens already verified are served from
+        a bounded LRU cache until their expiration (exp).
+
+        :param str token: the JWT
+        :return: the token's payload
+        :raises InvalidTokenError: if the token is invalid or expired
+    """
+
+    key = hashlib.sha256(token.encode()).hexdigest()
+    now = time.time()
+
+    # Return the cached payload if the token was already verified and hasn't expired
+    with _verified_tokens_lock:
+        entry = _verified_tokens.get(key)
+        if entry is not None:
+            expiration, payload = entry
+            if expiration > now:
+                _verified_tokens.move_to_end(key)
+                return payload
+            del _verified_tokens[key]
+
+    # Verify the token
+    payload = jwt.decode(jwt=token, key=SECRET_KEY, algorithms=[ALGORITHM])
+
+    # Cache it (tokens without expiration aren't cached)
+    expiration = payload.get("exp")
+    if TOKEN_CACHE_SIZE > 0 and expiration is not None:
+        with _verified_tokens_lock:
+            _verified_tokens[key] = (float(expiration), payload)
+            _verified_tokens.move_to_end(key)
+            while len(_verified_tokens) > TOKEN_CACHE_SIZE:
+                _verified_tokens.popitem(last=False)
+
+    return payload
+###################################################################################################
+
+
 ###################################################################################################
 # Function to get the current user from the jwt
-def get_current_user(
+async def get_current_user(
         token: Annotated[str, Depends(oauth2_scheme)]
 ):
     try:
         # Get the username (sub) from decoding the jwt
-        payload = jwt.decode(jwt=token, key=SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username = payload.get("sub")
         
         # Raise Exception if username is None
@@ -4,7 +4,15 @@
 
 ###################################################################################################
 # Imports
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
+from app.monitoring.metrics import (
+    HASH_POOL_WAIT_SECONDS, HASH_DURATION_SECONDS, HASH_POOL_REJECTED_TOTAL
+)
 ###################################################################################################
 
 
@@ -29,4 +37,68 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     if verify:
         return True
     else:
-        return False
\ No newline at end of file
+        return False
+###################################################################################################
+
+
+###################################################################################################
+# Hashing pool
+
+# Number of worker threads running bcrypt (bcrypt releases the GIL while hashing)
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", 4))
+# Maximum number of jobs waiting for a free worker
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", 32))
+
+hash_executor = ThreadPoolExecutor(max_workers=HASH_POOL_SIZE, thread_name_prefix="hashing")
+
+# One slot per running or queued job
+_hash_slots = threading.BoundedSemaphore(HASH_POOL_SIZE + HASH_QUEUE_LIMIT)
+
+
+class HashingPoolFull(Exception):
+    """ Raised when the hashing queue is full and the job can't be accepted """
+
+
+async def _run_in_hash_pool(operation: str, func, *args):
+
+    """ Function to run a hashing function in the hashing pool without blocking the event loop.
+
+        :param str operation: the operation name used in the metrics (hash or verify)
+        :param func: the function to be executed
+        :return: the function's result
+        :raises HashingPoolFull: if there are no free slots in the pool
+    """
+
+    # Reject the job if the queue is full
+    if not _hash_slots.acquire(blocking=False):
+        HASH_POOL_REJECTED_TOTAL.labels(operation=operation).inc()
+        raise HashingPoolFull()
+
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        HASH_POOL_WAIT_SECONDS.observe(started - submitted)
+        try:
+            return func(*args)
+        finally:
+            HASH_DURATION_SECONDS.labels(operation=operation).observe(
+                time.perf_counter() - started
+            )
+
+    # The slot is released when the job finishes, even if the request is cancelled
+    future = hash_executor.submit(job)
+    future.add_done_callback(lambda _: _hash_slots.release())
+
+    return await asyncio.wrap_future(future)
+
+
+# Hash password in the hashing pool
+async def hash_password_async(plain_password: str) -> str:
+    return await _run_in_hash_pool("hash", hash_password, plain_password)
+
+
+# Verify password in the hashing pool
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool("verify", verify_password, plain_password, hashed_password)
+###################################################################################################
@@ -0,0 +1,138 @@
+#####################
+# Battle simulation #
+#####################
+
+###################################################################################################
+# Imports
+import os
+from dataclasses import dataclass
+import numpy as np
+###################################################################################################
+
+
+###################################################################################################
+# Configuration
+
+# Matchups scored at once (heroes are processed in chunks of rows, so the memory used doesn't
+# grow with N x M: 4M cells are 32 MB of float64)
+BATTLE_CHUNK_CELLS = int(os.getenv("BATTLE_CHUNK_CELLS", 4_000_000))
+###################################################################################################
+
+
+###################################################################################################
+# Duel model
+#
+# A character's strength is the total damage of their powers. In a duel each side deals a
+# uniformly random share of their strength, and the hero wins if they deal more damage:
+#   P(U1 * a > U2 * b) = 1 - b / 2a   if a >= b
+#                        a / 2b       if a <  b
+# (0.5 when both are 0). Expected mode returns these probabilities; Monte Carlo mode plays
+# `trials` duels per matchup, drawn from a binomial (the number of wins of `trials` independent
+# duels), so the cost doesn't depend on the number of trials.
+
+def win_probability(hero_strength: np.ndarray, villain_strength: np.ndarray) -> np.ndarray:
+
+    """ Function to score every hero against every villain
+
+        :param np.ndarray hero_strength: the heroes' strength, shape (N,)
+        :param np.ndarray villain_strength: the villains' strength, shape (M,)
+        :return: the probability of the hero winning each matchup, shape (N, M)
+    """
+
+    a = np.asarray(hero_strength, dtype=np.float64)[:, None]
+    b = np.asarray(villain_strength, dtype=np.float64)[None, :]
+
+    # Computed in place, to allocate only two (N, M) arrays
+    stronger = np.maximum(a, b)
+    probability = np.minimum(a, b)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        probability /= stronger
+    probability *= 0.5
+    np.subtract(1.0, probability, out=probability, where=a >= b)
+    # 0 vs 0 is a draw
+    probability[stronger == 0] = 0.5
+
+    return probability
+###################################################################################################
+
+
+###################################################################################################
+# Simulation
+@dataclass
+class SimulationResult:
+    # Win rate of each hero (against every villain) and of each villain (against every hero)
+    hero_win_rates: np.ndarray
+    villain_win_rates: np.ndarray
+    # Hero win rate of every matchup, only when requested
+    matchups: np.ndarray | None = None
+
+
+def simulate(
+    hero_strength: np.ndarray,
+    villain_strength: np.ndarray,
+    trials: int | None = None,
+    seed: int | None = None,
+    keep_matchups: bool = False
+) -> SimulationResult:
+
+    """ Function to score N x M hero / villain matchups, in chunks of heroes
+
+        :param np.ndarray hero_strength: the heroes' strength, shape (N,)
+        :param np.ndarray villain_strength: the villains' strength, shape (M,)
+        :param int trials: duels played per matchup (Monte Carlo mode), None for the expected
+        win probabilities
+        :param int seed: the seed of the Monte Carlo mode (same seed, same result)
+        :param bool keep_matchups: return the (N, M) matrix of win rates too
+        :return: a SimulationResult
+    """
+
+    hero_strength = np.asarray(hero_strength, dtype=np.float64)
+    villain_strength = np.asarray(villain_strength, dtype=np.float64)
+    n, m = len(hero_strength), len(villain_strength)
+
+    rng = np.random.default_rng(seed) if trials is not None else None
+    hero_win_rates = np.empty(n)
+    villain_losses = np.zeros(m)
+    matchups = np.empty((n, m)) if keep_matchups else None
+
+    rows = max(1, BATTLE_CHUNK_CELLS // max(m, 1))
+    for start in range(0, n, rows):
+        chunk = win_probability(hero_strength[start:start + rows], villain_strength)
+        if rng is not None:
+            chunk = rng.binomial(trials, chunk) / trials
+
+        if m:
+            hero_win_rates[start:start + rows] = chunk.mean(axis=1)
+        villain_losses += chunk.sum(axis=0)
+        if matchups is not None:
+            matchups[start:start + rows] = chunk
+
+    if not m:
+        hero_win_rates[:] = 0.0
+    villain_win_rates = 1.0 - villain_losses / n if n else np.zeros(m)
+
+    return SimulationResult(hero_win_rates, villain_win_rates, matchups)
+
+
+def top(values: np.ndarray, k: int) -> np.ndarray:
+
+    """ Function to get the positions of the k highest values, highest first, without
+        sorting the whole array
+
+        :param np.ndarray values: the values
+        :param int k: the number of positions
+        :return: the positions
+    """
+
+    k = min(k, len(values))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < len(values):
+        candidates = np.argpartition(-values, k - 1)[:k]
+    else:
+        candidates = np.arange(len(values))
+
+    # Highest value first, then lowest position
+    return candidates[np.lexsort((candidates, -values[candidates]))]
+###################################################################################################
@@ -0,0 +1,227 @@
+##################
+# Response cache #
+##################
+
+###################################################################################################
+# Imports
+import os
+import orjson
+import time
+from collections import OrderedDict
+from typing import Any
+from app.monitoring.metrics import CACHE_HITS_TOTAL, CACHE_MISSES_TOTAL, CACHE_EVICTIONS_TOTAL
+###################################################################################################
+
+
+###################################################################################################
+# Configuration
+
+# Backend: "memory" (in-process LRU + TTL), "redis" (any Redis-protocol server) or "none".
+# The memory backend is per process: a write only invalidates the entries of the worker that
+# handled it, the other workers serve their cached rows (and ETags) until the TTL expires, so
+# use redis (or none) with several workers
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+# Time to live of the cached entries (seconds)
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 60))
+# Maximum number of entries of the memory backend
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+# Redis URL used by the redis backend
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+###################################################################################################
+
+
+###################################################################################################
+# Backends
+class MemoryCacheBackend:
+
+    """ In-process cache with LRU eviction and a TTL per entry """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        # Counters (list versions) are kept apart so they are never evicted
+        self._counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        if key in self._counters:
+            return str(self._counters[key]).encode()
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            CACHE_EVICTIONS_TOTAL.labels(backend=self.name, reason="expired").inc()
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        # Evict the least recently used entries
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            CACHE_EVICTIONS_TOTAL.labels(backend=self.name, reason="capacity").inc()
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisCacheBackend:
+
+    """ Cache stored in a Redis-protocol server. Any client exposing the redis.asyncio
+        interface (get, set, delete, incr) can be passed, e.g. a local stand-in for tests.
+        Evictions are done by the server and aren't counted here.
+    """
+
+    name = "redis"
+
+    def __init__(self, client=None, url: str = REDIS_URL):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        await self.client.set(key, value, ex=ttl)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+
+class NullCacheBackend:
+
+    """ Backend that doesn't store anything (cache disabled) """
+
+    name = "none"
+
+    async def get(self, key: str) -> bytes | None:
+        return None
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        pass
+
+    async def delete(self, *keys: str):
+        pass
+
+    async def incr(self, key: str) -> int:
+        return 0
+###################################################################################################
+
+
+###################################################################################################
+# Cache
+class Cache:
+
+    """ Read-through JSON cache on top of a backend """
+
+    def __init__(self, backend, ttl: int = CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+
+    async def get_json(self, key: str) -> Any | None:
+
+        """ Method to get a cached value
+
+            :param str key: the cache key
+            :return: the cached value or None on a miss
+        """
+
+        namespace = key.split(":", 1)[0]
+        value = await self.backend.get(key)
+
+        if value is None:
+            CACHE_MISSES_TOTAL.labels(namespace=namespace).inc()
+            return None
+
+        CACHE_HITS_TOTAL.labels(namespace=namespace).inc()
+        return orjson.loads(value)
+
+    async def set_json(self, key: str, value: Any):
+
+        """ Method to store a JSON serializable value
+
+            :param str key: the cache key
+            :param value: the value to be cached
+        """
+
+        await self.backend.set(key, orjson.dumps(value), self.ttl)
+
+    async def invalidate(self, *keys: str):
+
+        """ Method to remove entries from the cache
+
+            :param str keys: the keys to be removed
+        """
+
+        await self.backend.delete(*keys)
+
+    async def list_key(self, namespace: str, **params) -> str:
+
+        """ Method to build the key of a list page. The key includes the namespace's
+            list version, so bumping the version invalidates every page at once.
+
+            :param str namespace: the list namespace (e.g. powers)
+            :return: the cache key (str)
+        """
+
+        version = await self.backend.get(f"{namespace}:list:version")
+        version = int(version) if version else 0
+        query = ":".join(f"{name}={value}" for name, value in sorted(params.items()))
+        return f"{namespace}:list:v{version}:{query}"
+
+    async def invalidate_list(self, namespace: str):
+
+        """ Method to invalidate every cached page of a list
+
+            :param str namespace: the list namespace (e.g. powers)
+        """
+
+        await self.backend.incr(f"{namespace}:list:version")
+
+
+# Build the cache from the configuration
+def build_cache() -> Cache:
+    if CACHE_BACKEND == "redis":
+        return Cache(RedisCacheBackend())
+    if CACHE_BACKEND == "none":
+        return Cache(NullCacheBackend())
+    return Cache(MemoryCacheBackend(max_entries=CACHE_MAX_ENTRIES))
+
+
+cache = build_cache()
+###################################################################################################
+
+
+###################################################################################################
+# Keys
+def power_key(power_id: int) -> str:
+    return f"powers:{power_id}"
+
+
+def character_key(character_id: int) -> str:
+    return f"characters:{character_id}"
+
+
+def character_powers_key(character_id: int) -> str:
+    return f"characters:{character_id}:powers"
+###################################################################################################
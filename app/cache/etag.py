@@ -0,0 +1,54 @@
+#############################
+# ETags and conditional GET #
+#############################
+
+###################################################################################################
+# Imports
+import hashlib
+import orjson
+from typing import Any
+from fastapi import Request, Response, status
+###################################################################################################
+
+
+###################################################################################################
+# ETag builders
+
+# ETag of one row, derived from its version
+def row_etag(namespace: str, row_id: int, version: int) -> str:
+    return f'"{namespace}-{row_id}-v{version}"'
+
+
+# ETag of any JSON serializable content, derived from a hash of its canonical JSON
+def content_etag(content: Any) -> str:
+    canonical = orjson.dumps(content, option=orjson.OPT_SORT_KEYS)
+    return '"' + hashlib.sha256(canonical).hexdigest()[:32] + '"'
+###################################################################################################
+
+
+###################################################################################################
+# Conditional GET
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+
+    """ Function to add the ETag header to the response and check the request's
+        If-None-Match header.
+
+        :param Request request: the incoming request
+        :param Response response: the endpoint's response (the ETag header is added)
+        :param str etag: the current ETag of the resource
+        :return: a 304 Not Modified response if the client's copy is up to date, else None
+    """
+
+    response.headers["ETag"] = etag
+
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+
+    # If-None-Match uses the weak comparison (ignore the W/ prefix)
+    client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in client_etags or etag in client_etags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    return None
+###################################################################################################
@@ -0,0 +1,226 @@
+###############
+# Leaderboard #
+###############
+
+###################################################################################################
+# Imports
+import os
+import asyncio
+import logging
+import time
+from sortedcontainers import SortedList
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.crud.character_power_stats import CharacterPowerStatsCrud
+###################################################################################################
+
+
+###################################################################################################
+# Configuration
+
+# Seconds between full rebuilds from the database (0 to rebuild only at startup). Each worker
+# keeps its own ranking, so this bounds how long the changes made by other workers take to show
+LEADERBOARD_REFRESH_SECONDS = int(os.getenv("LEADERBOARD_REFRESH_SECONDS", 300))
+
+logger = logging.getLogger("app.leaderboard")
+###################################################################################################
+
+
+###################################################################################################
+# Ranking
+class Leaderboard:
+
+    """ In-process ranking of the heroes and of the villains by the total damage of their
+        powers (highest first, ties by character_id). Each type is a SortedList of
+        (-total_damage, character_id), so moving an entry, the top K and the rank of a
+        character are O(log n). It's rebuilt from characterpowerstats at startup and the
+        CRUD methods move the affected entries right after their commits, before any other
+        await, so the changes of concurrent requests are applied in commit order.
+
+        The ranking is per process: with several workers, each one only sees its own writes
+        until its next rebuild (every LEADERBOARD_REFRESH_SECONDS), so two workers may
+        answer with different rankings in between.
+    """
+
+    def __init__(self):
+        self._rankings: dict[str, SortedList] = {"hero": SortedList(), "villain": SortedList()}
+        # character_id -> (character_type, total_damage)
+        self._entries: dict[int, tuple[str, int]] = {}
+        self.built_at: float | None = None
+        # Changes made while a rebuild reads the database, replayed after the swap
+        self._pending: list[tuple] | None = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    ###############################################################################################
+    # Updates
+    def set(self, character_id: int, total_damage: int, character_type: str | None = None):
+
+        """ Method to add a character or move them to their new total damage
+
+            :param int character_id: the character's ID
+            :param int total_damage: the character's new total damage
+            :param str character_type: hero or villain (needed for new characters only)
+        """
+
+        if self._pending is not None:
+            self._pending.append((self.set, character_id, total_damage, character_type))
+
+        entry = self._entries.get(character_id)
+        if entry is not None:
+            character_type = entry[0]
+            self._rankings[character_type].remove((-entry[1], character_id))
+        elif character_type is None:
+            return
+
+        self._rankings[character_type].add((-total_damage, character_id))
+        self._entries[character_id] = (character_type, total_damage)
+
+
+    def set_many(self, totals: list[tuple[int, int]]):
+
+        """ Method to move many characters, e.g. the holders of an updated power
+
+            :param list totals: (character_id, total_damage) of each character
+        """
+
+        for character_id, total_damage in totals:
+            self.set(character_id, total_damage)
+
+
+    def remove(self, character_id: int):
+
+        """ Method to remove a deleted character
+
+            :param int character_id: the character's ID
+        """
+
+        if self._pending is not None:
+            self._pending.append((self.remove, character_id))
+
+        entry = self._entries.pop(character_id, None)
+        if entry is not None:
+            self._rankings[entry[0]].remove((-entry[1], character_id))
+    ###############################################################################################
+
+
+    ###############################################################################################
+    # Queries
+    def size(self, character_type: str) -> int:
+        return len(self._rankings[character_type])
+
+
+    def top(self, character_type: str, limit: int, offset: int = 0) -> list[tuple[int, int, int]]:
+
+        """ Method to get a page of the ranking
+
+            :param str character_type: hero or villain
+            :param int limit: the maximum number of characters returned
+            :param int offset: the characters skipped
+            :return: a list of (rank, character_id, total_damage), rank starting at 1
+        """
+
+        ranking = self._rankings[character_type]
+        return [
+            (offset + position + 1, character_id, -negative_damage)
+            for position, (negative_damage, character_id) in enumerate(
+                ranking.islice(offset, offset + limit)
+            )
+        ]
+
+
+    def rank(self, character_id: int) -> tuple[str, int, int] | None:
+
+        """ Method to get the position of a character in their ranking
+
+            :param int character_id: the character's ID
+            :return: (character_type, rank, total_damage), or None if the character isn't ranked
+        """
+
+        entry = self._entries.get(character_id)
+        if entry is None:
+            return None
+
+        character_type, total_damage = entry
+        position = self._rankings[character_type].index((-total_damage, character_id))
+        return character_type, position + 1, total_damage
+    ###############################################################################################
+
+
+    ###############################################################################################
+    # Rebuild
+    async def rebuild(self, session: AsyncSession):
+
+        """ Method to rebuild the rankings from the precomputed stats (one query). The new
+            rankings are built apart and swapped in.
+
+            :param AsyncSession session: database session
+        """
+
+        async with self._lock:
+            self._pending = []
+            try:
+                rows = await CharacterPowerStatsCrud.read_totals(session)
+            except Exception:
+                self._pending = None
+                raise
+
+            rankings = {"hero": [], "villain": []}
+            entries = {}
+            for character_id, character_type, total_damage in rows:
+                rankings[character_type.name].append((-total_damage, character_id))
+                entries[character_id] = (character_type.name, total_damage)
+
+            self._rankings = {
+                character_type: SortedList(keys) for character_type, keys in rankings.items()
+            }
+            self._entries = entries
+            self.built_at = time.monotonic()
+
+            # Replay the changes committed while the rows were read
+            pending, self._pending = self._pending, None
+            for method, *args in pending:
+                method(*args)
+
+
+    async def ensure_built(self, session: AsyncSession):
+
+        """ Method to build the rankings if the startup build hasn't finished yet
+
+            :param AsyncSession session: database session
+        """
+
+        if self.built_at is None:
+            await self.rebuild(session)
+
+
+    async def _refresh(self, session_maker):
+        while True:
+            try:
+                async with session_maker() as session:
+                    await self.rebuild(session)
+            except Exception as error:
+                logger.warning("Leaderboard rebuild failed: %r", error)
+            if LEADERBOARD_REFRESH_SECONDS <= 0:
+                return
+            await asyncio.sleep(LEADERBOARD_REFRESH_SECONDS)
+
+
+    def start_refresh(self, session_maker):
+
+        """ Method to build the rankings in the background, and rebuild them every
+            LEADERBOARD_REFRESH_SECONDS (if it isn't running)
+
+            :param session_maker: the factory of database sessions
+        """
+
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._refresh(session_maker))
+    ###############################################################################################
+###################################################################################################
+
+
+###################################################################################################
+# Leaderboard used by the API
+leaderboard = Leaderboard()
+###################################################################################################
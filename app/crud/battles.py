@@ -0,0 +1,78 @@
+#################
+# Battle's CRUD #
+#################
+
+###################################################################################################
+# Imports
+import numpy as np
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.characters import Character, CharacterType
+from app.models.character_power import CharacterPowerStats
+###################################################################################################
+
+
+###################################################################################################
+###################################################################################################
+class BattleCrud:
+
+    ###############################################################################################
+    # Read
+    @staticmethod
+    async def load_fighters(
+        *,
+        session: AsyncSession,
+        hero_ids: list[int] | None = None,
+        villain_ids: list[int] | None = None
+    ) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        """
+            Method to load the IDs and strength (total damage of their powers, precomputed in
+            characterpowerstats) of the heroes and villains, in one query, into NumPy arrays
+
+            :param AsyncSession session: database session
+            :param list[int] hero_ids: the heroes to load (None for all of them)
+            :param list[int] villain_ids: the villains to load (None for all of them)
+            :return: {"hero": (ids, strength), "villain": (ids, strength)}, sorted by ID
+        """
+        query = (
+            select(
+                Character.character_id,
+                Character.character_type,
+                CharacterPowerStats.total_damage
+            )
+            .join(CharacterPowerStats, CharacterPowerStats.character_id == Character.character_id)
+            .order_by(Character.character_id)
+        )
+        if hero_ids is not None and villain_ids is not None:
+            query = query.where(Character.character_id.in_(hero_ids + villain_ids))
+        elif hero_ids is not None:
+            query = query.where(
+                (Character.character_type == "villain") | Character.character_id.in_(hero_ids)
+            )
+        elif villain_ids is not None:
+            query = query.where(
+                (Character.character_type == "hero") | Character.character_id.in_(villain_ids)
+            )
+
+        rows = (await session.exec(query)).all()
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        is_hero = np.fromiter(
+            (row[1] == CharacterType.hero for row in rows), dtype=bool, count=len(rows)
+        )
+        strength = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+
+        fighters = {}
+        for character_type, mask, requested in (
+            ("hero", is_hero, hero_ids),
+            ("villain", ~is_hero, villain_ids)
+        ):
+            # Keep only the requested IDs of the type (an ID may be in both lists)
+            if requested is not None:
+                mask = mask & np.isin(ids, requested)
+            fighters[character_type] = (ids[mask], strength[mask])
+
+        return fighters
+    ###############################################################################################
+
+###################################################################################################
+###################################################################################################
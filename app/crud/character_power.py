@@ -4,12 +4,18 @@
 
 ###################################################################################################
 # Imports
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlalchemy import delete
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import joinedload
 from app.models.character_power import CharacterPower
 from app.models.characters import Character
 from app.models.powers import Powers
+from app.crud.character_power_stats import CharacterPowerStatsCrud
+from app.cache.cache import cache, character_key, character_powers_key
+from app.cache.leaderboard import leaderboard
 
 ###################################################################################################
 
@@ -21,8 +27,8 @@ class CharacterPowerCrud:
 ##################################################################################################
 # Create
     @staticmethod
-    def assign_power_to_character(
-        session: Session,
+    async def assign_power_to_character(
+        session: AsyncSession,
         character_id: int,
         power_id: int
     ) -> bool | None:
@@ -30,96 +36,195 @@ class CharacterPowerCrud:
         """ Method to give a power to a character by passing the character_id and the
             power_id
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param int character_id: the character's id
             :param int power_id: the power's id
             :return: True if the power was assigned, False if there was an IntegrityError
         """
 
-        # Verify that the character and the power exist
-        character = session.get(Character, character_id)
-        power = session.get(Powers, power_id)
+        # Verify that the character and the power exist (the power is locked, shared, so its
+        # damage can't change before the stats are updated)
+        character = await session.get(Character, character_id)
+        power = (await session.exec(
+            select(Powers).where(Powers.power_id == power_id).with_for_update(read=True)
+        )).first()
 
         # Return None if the character or the power doesn't exist
         if not character or not power:
             return None
         
-        # Assign the power to the character
+        # Assign the power to the character and update their stats
         try:
             link = CharacterPower(character_id=character_id, power_id=power_id)
             session.add(link)
-            session.commit()
+            stats = await CharacterPowerStatsCrud.add_powers(
+                session, character_id, [power.power_damage]
+            )
+            await session.commit()
+            leaderboard.set(character_id, stats.total_damage)
+            await cache.invalidate(character_key(character_id), character_powers_key(character_id))
             return True
         
         except IntegrityError:
-            session.rollback()
+            await session.rollback()
             return False
+
+
+    @staticmethod
+    async def assign_powers_to_character(
+        session: AsyncSession,
+        character_id: int,
+        power_ids: list[int]
+    ) -> dict | None:
+
+        """ Method to give many powers to a character at once. The power IDs are validated
+            in one query and the links are inserted in one INSERT ... ON CONFLICT DO NOTHING.
+
+            :param AsyncSession session: database session
+            :param int character_id: the character's id
+            :param list[int] power_ids: the powers' ids
+            :return: a dict with the assigned, already_present and missing power ids, or None
+            if the character doesn't exist
+        """
+
+        # Verify that the character exists
+        character = await session.get(Character, character_id)
+        if not character:
+            return None
+
+        # Remove repeated ids (keeping the order)
+        power_ids = list(dict.fromkeys(power_ids))
+
+        # Get the powers that exist (and their damage, for the stats). They're locked (shared)
+        # so their damage can't change before the stats are updated
+        existing = dict((await session.exec(
+            select(Powers.power_id, Powers.power_damage)
+            .where(Powers.power_id.in_(power_ids))
+            .with_for_update(read=True)
+        )).all()) if power_ids else {}
+
+        # Insert the links (the ones already present aren't returned)
+        assigned = set()
+        if existing:
+            statement = (
+                insert(CharacterPower)
+                .values([
+                    {"character_id": character_id, "power_id": power_id}
+                    for power_id in power_ids if power_id in existing
+                ])
+                .on_conflict_do_nothing()
+                .returning(CharacterPower.power_id)
+            )
+            assigned = set((await session.execute(statement)).scalars().all())
+            stats = await CharacterPowerStatsCrud.add_powers(
+                session, character_id, [existing[power_id] for power_id in assigned]
+            )
+            await session.commit()
+
+            if assigned:
+                leaderboard.set(character_id, stats.total_damage)
+                await cache.invalidate(
+                    character_key(character_id), character_powers_key(character_id)
+                )
+
+        return {
+            "character_id": character_id,
+            "assigned": [power_id for power_id in power_ids if power_id in assigned],
+            "already_present": [
+                power_id for power_id in power_ids
+                if power_id in existing and power_id not in assigned
+            ],
+            "missing": [power_id for power_id in power_ids if power_id not in existing]
+        }
 ##################################################################################################
 
 
 ##################################################################################################
 # Read
     @staticmethod
-    def read_characters_powers(session: Session, character_id: int)-> list[Powers]:
+    async def read_characters_powers(session: AsyncSession, character_id: int)-> Character | None:
 
-        """ Method to return a list of a charater's powers by passing the character's ID
+        """ Method to return a charater with their powers loaded by passing the character's ID.
+            The character and the powers are fetched in a single query.
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param int character_id: the character's ID
-            :return: a list of objects Powers
+            :return: an object Character (with its powers) or None if the character doesn't exist
         """
         
-        # Get the character
-        character = session.get(Character, character_id)
-
-        # If character is None, then return None
-        if not character:
-            return None
-        
-        # Get the character's powers
-        character_powers = character.powers
+        # Get the character and their powers (joined in the same query)
+        statement = (
+            select(Character)
+            .where(Character.character_id == character_id)
+            .options(joinedload(Character.powers))
+        )
+        character = (await session.exec(statement)).unique().first()
 
-        # Return the character's powers
-        return character_powers
+        # Return the character (None if it doesn't exist)
+        return character
 ##################################################################################################
 
 
 ##################################################################################################
 # Delete
     @staticmethod
-    def delete_character_power(
-        session: Session,
+    async def delete_character_power(
+        session: AsyncSession,
         character_id: int,
         power_id: int
-    ) -> bool:
+    ) -> tuple[Character, Powers] | None:
         
         """ Method to delete a power of a character by passing the character_id and power_id
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param int character_id: the character's id
             :param int power_id: the id of the power to be deleted from the character
+            :return: the character and the removed power, or None if the character doesn't
+            have the power
         """
 
-        # Get the character and the power
+        # Get the character and the power if the character has it (in the same query). The
+        # power is locked (shared) so its damage can't change before the stats are updated
         statement = (
-            select(CharacterPower)
+            select(Character, Powers)
+            .join(CharacterPower, CharacterPower.character_id == Character.character_id)
+            .join(Powers, Powers.power_id == CharacterPower.power_id)
             .where(
                 CharacterPower.character_id == character_id,
                 CharacterPower.power_id == power_id
             )
+            .with_for_update(read=True, of=Powers)
         )
-        character_power = session.exec(statement).first()
+        row = (await session.exec(statement)).first()
 
-        # If character_power is None, then return False (character or power not found)
-        if character_power is None:
-            return False
+        # If row is None, then return None (character or power not found)
+        if row is None:
+            return None
         
-        # Delete the power from the character
-        session.delete(character_power)
-        session.commit()
+        # Delete the power from the character. The stats are only updated if the link was
+        # deleted here (a concurrent request may have deleted it first)
+        character, power = row
+        deleted = (await session.execute(
+            delete(CharacterPower)
+            .where(
+                CharacterPower.character_id == character_id,
+                CharacterPower.power_id == power_id
+            )
+            .returning(CharacterPower.power_id)
+        )).scalar()
+        if deleted is None:
+            await session.rollback()
+            return None
+
+        stats = await CharacterPowerStatsCrud.remove_power(
+            session, character_id, power.power_damage
+        )
+        await session.commit()
+        leaderboard.set(character_id, stats.total_damage)
+        await cache.invalidate(character_key(character_id), character_powers_key(character_id))
 
-        # Returns True if the power has been deleted
-        return True
+        # Returns the character and the deleted power
+        return character, power
 ##################################################################################################
 
 ###################################################################################################
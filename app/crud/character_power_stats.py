@@ -0,0 +1,317 @@
+############################
+# CharacterPowerStats CRUD #
+############################
+
+###################################################################################################
+# Imports
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import insert, update, case, func, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
+from app.models.character_power import CharacterPower, CharacterPowerStats
+from app.models.characters import Character, CharacterType
+from app.models.powers import Powers
+###################################################################################################
+
+
+###################################################################################################
+# Max damage of the character of each stats row, computed from their links (correlated subquery,
+# served by the primary key of characterpower)
+def _max_damage(exclude_power_id: int | None = None):
+    link = aliased(CharacterPower)
+    query = (
+        select(func.coalesce(func.max(Powers.power_damage), 0))
+        .select_from(link)
+        .join(Powers, Powers.power_id == link.power_id)
+        .where(link.character_id == CharacterPowerStats.character_id)
+    )
+    if exclude_power_id is not None:
+        query = query.where(link.power_id != exclude_power_id)
+
+    return query.correlate(CharacterPowerStats).scalar_subquery()
+
+
+# Characters that have a power
+def _holders(power_id: int):
+    return select(CharacterPower.character_id).where(CharacterPower.power_id == power_id)
+###################################################################################################
+
+
+###################################################################################################
+###################################################################################################
+class CharacterPowerStatsCrud:
+
+    """ Every character has one stats row (created with the character). The methods below
+        are called inside the transaction that changes the links or the damages, before its
+        commit, so the stats are always consistent with them. Count and total are updated
+        with deltas; the max is only recomputed from the character's links when the removed
+        or weakened power was the max.
+    """
+
+###################################################################################################
+# Create
+    @staticmethod
+    async def create_stats(
+        session: AsyncSession,
+        character_ids: list[int]
+    ) -> list[CharacterPowerStats]:
+
+        """ Method to create the (empty) stats of new characters
+
+            :param AsyncSession session: database session
+            :param list[int] character_ids: the new characters' IDs
+            :return: the stats, in the same order
+        """
+
+        if not character_ids:
+            return []
+
+        return (await session.scalars(
+            insert(CharacterPowerStats).returning(
+                CharacterPowerStats, sort_by_parameter_order=True
+            ),
+            [{"character_id": character_id} for character_id in character_ids]
+        )).all()
+###################################################################################################
+
+
+###################################################################################################
+# Links
+    @staticmethod
+    async def add_powers(
+        session: AsyncSession,
+        character_id: int,
+        damages: list[int]
+    ) -> CharacterPowerStats | None:
+
+        """ Method to add new powers to the stats of a character
+
+            :param AsyncSession session: database session
+            :param int character_id: the character's ID
+            :param list[int] damages: the damages of the assigned powers
+            :return: the updated stats
+        """
+
+        if not damages:
+            return None
+
+        return (await session.scalars(
+            update(CharacterPowerStats)
+            .where(CharacterPowerStats.character_id == character_id)
+            .values(
+                power_count=CharacterPowerStats.power_count + len(damages),
+                total_damage=CharacterPowerStats.total_damage + sum(damages),
+                max_damage=case(
+                    (CharacterPowerStats.max_damage < max(damages), max(damages)),
+                    else_=CharacterPowerStats.max_damage
+                )
+            )
+            # Refresh the stats already loaded in the session (e.g. with the character)
+            .returning(CharacterPowerStats)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )).first()
+
+
+    @staticmethod
+    async def remove_power(
+        session: AsyncSession,
+        character_id: int,
+        damage: int
+    ) -> CharacterPowerStats | None:
+
+        """ Method to remove a power from the stats of a character (after the link has been
+            deleted)
+
+            :param AsyncSession session: database session
+            :param int character_id: the character's ID
+            :param int damage: the damage of the removed power
+            :return: the updated stats
+        """
+
+        return (await session.scalars(
+            update(CharacterPowerStats)
+            .where(CharacterPowerStats.character_id == character_id)
+            .values(
+                power_count=CharacterPowerStats.power_count - 1,
+                total_damage=CharacterPowerStats.total_damage - damage,
+                max_damage=case(
+                    (CharacterPowerStats.max_damage <= damage, _max_damage()),
+                    else_=CharacterPowerStats.max_damage
+                )
+            )
+            .returning(CharacterPowerStats)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )).first()
+###################################################################################################
+
+
+###################################################################################################
+# Powers
+    @staticmethod
+    async def change_damage(
+        session: AsyncSession,
+        power_id: int,
+        old_damage: int,
+        new_damage: int
+    ) -> list[tuple[int, int]]:
+
+        """ Method to update the stats of every character that has a power whose damage
+            changed (after the power has been updated)
+
+            :param AsyncSession session: database session
+            :param int power_id: the power's ID
+            :param int old_damage: the previous damage of the power
+            :param int new_damage: the new damage of the power
+            :return: the (character_id, total_damage) of every character that has the power
+            (also when the damage didn't change, e.g. to invalidate their cached powers)
+        """
+
+        holders = CharacterPowerStats.character_id.in_(_holders(power_id))
+        if old_damage == new_damage:
+            return (await session.execute(
+                select(CharacterPowerStats.character_id, CharacterPowerStats.total_damage)
+                .where(holders)
+            )).all()
+
+        return (await session.execute(
+            update(CharacterPowerStats)
+            .where(holders)
+            .values(
+                total_damage=CharacterPowerStats.total_damage + (new_damage - old_damage),
+                max_damage=case(
+                    (CharacterPowerStats.max_damage <= new_damage, new_damage),
+                    # The power was the max and it's weaker now
+                    (CharacterPowerStats.max_damage <= old_damage, _max_damage()),
+                    else_=CharacterPowerStats.max_damage
+                )
+            )
+            .returning(CharacterPowerStats.character_id, CharacterPowerStats.total_damage)
+            .execution_options(synchronize_session=False)
+        )).all()
+
+
+    @staticmethod
+    async def remove_power_from_holders(
+        session: AsyncSession,
+        power_id: int,
+        damage: int
+    ) -> list[tuple[int, int]]:
+
+        """ Method to update the stats of every character that has a power about to be
+            deleted (before the power and its links are deleted)
+
+            :param AsyncSession session: database session
+            :param int power_id: the power's ID
+            :param int damage: the damage of the power
+            :return: the (character_id, total_damage) of the updated characters
+        """
+
+        return (await session.execute(
+            update(CharacterPowerStats)
+            .where(CharacterPowerStats.character_id.in_(_holders(power_id)))
+            .values(
+                power_count=CharacterPowerStats.power_count - 1,
+                total_damage=CharacterPowerStats.total_damage - damage,
+                max_damage=case(
+                    (
+                        CharacterPowerStats.max_damage <= damage,
+                        _max_damage(exclude_power_id=power_id)
+                    ),
+                    else_=CharacterPowerStats.max_damage
+                )
+            )
+            .returning(CharacterPowerStats.character_id, CharacterPowerStats.total_damage)
+            .execution_options(synchronize_session=False)
+        )).all()
+###################################################################################################
+
+
+###################################################################################################
+# Read
+    @staticmethod
+    async def read_totals(session: AsyncSession) -> list[tuple[int, CharacterType, int]]:
+
+        """ Method to read the total damage of every character (to build the leaderboard)
+
+            :param AsyncSession session: database session
+            :return: a list of (character_id, character_type, total_damage)
+        """
+
+        return (await session.execute(
+            select(
+                Character.character_id,
+                Character.character_type,
+                CharacterPowerStats.total_damage
+            )
+            .join(CharacterPowerStats, CharacterPowerStats.character_id == Character.character_id)
+        )).all()
+###################################################################################################
+
+
+###################################################################################################
+# Rebuild
+    @staticmethod
+    async def rebuild(
+        session: AsyncSession,
+        character_ids: list[int] | None = None,
+        power_ids: list[int] | None = None
+    ):
+
+        """ Method to recompute the stats from the links, for bulk writes (the import). Only
+            the given characters and the holders of the given powers are recomputed, or every
+            character if both are None.
+
+            :param AsyncSession session: database session
+            :param list[int] character_ids: the characters to recompute
+            :param list[int] power_ids: recompute the characters that have these powers
+        """
+
+        stats = (
+            select(
+                Character.character_id,
+                func.count(Powers.power_id),
+                func.coalesce(func.sum(Powers.power_damage), 0),
+                func.coalesce(func.max(Powers.power_damage), 0)
+            )
+            .select_from(Character)
+            .outerjoin(CharacterPower, CharacterPower.character_id == Character.character_id)
+            .outerjoin(Powers, Powers.power_id == CharacterPower.power_id)
+            .group_by(Character.character_id)
+        )
+        if character_ids is not None or power_ids is not None:
+            # One set of IDs (UNION of the given characters and the holders), so the filter
+            # is a single condition on the primary key
+            targets = []
+            if character_ids:
+                targets.append(
+                    select(Character.character_id)
+                    .where(Character.character_id.in_(character_ids))
+                )
+            if power_ids:
+                targets.append(
+                    select(CharacterPower.character_id)
+                    .where(CharacterPower.power_id.in_(power_ids))
+                )
+            if not targets:
+                return
+            stats = stats.where(Character.character_id.in_(
+                targets[0] if len(targets) == 1 else union(*targets)
+            ))
+
+        statement = pg_insert(CharacterPowerStats).from_select(
+            ["character_id", "power_count", "total_damage", "max_damage"], stats
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["character_id"],
+            set_={
+                "power_count": statement.excluded.power_count,
+                "total_damage": statement.excluded.total_damage,
+                "max_damage": statement.excluded.max_damage
+            }
+        )
+        await session.execute(statement)
+###################################################################################################
+
+###################################################################################################
+###################################################################################################
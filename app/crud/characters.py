@@ -5,61 +5,170 @@
 
 ###################################################################################################
 # Imports
+import re
 from typing import Annotated
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import insert, func, literal_column, or_
+from sqlalchemy.orm import selectinload, contains_eager
+from sqlalchemy.orm.attributes import set_committed_value
 from pydantic import ValidationError
-from app.models.characters import Character
+from app.models.characters import Character, SEARCH_DOCUMENT
+from app.models.character_power import CharacterPowerStats
+from app.crud.character_power_stats import CharacterPowerStatsCrud
+from app.cache.cache import cache, character_key, character_powers_key
+from app.cache.leaderboard import leaderboard
+from app.crud.filters import escape_like, order_and_seek, id_in
 ###################################################################################################
 
 ###################################################################################################
 ###################################################################################################
 class CharacterCrud():
 
+    # Columns of the sort orders (besides the default, by ID)
+    SORT_COLUMNS = {"name": Character.name, "total_damage": CharacterPowerStats.total_damage}
+
     ###############################################################################################
     # Create
     @staticmethod
-    def create_character(*, session: Session, character: Character):
+    async def create_character(*, session: AsyncSession, character: Character):
         """
             Method to create new characters
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param Character character: Object Character
             :return: The created Character
         """
+        # The character is created with their (empty) stats
+        character.stats = CharacterPowerStats()
         session.add(character)
-        session.commit()
-        session.refresh(character)
+        await session.commit()
+        leaderboard.set(character.character_id, 0, character.character_type.name)
+        await session.refresh(character)
         return character
+
+
+    @staticmethod
+    async def create_characters(*, session: AsyncSession, characters: list[Character]):
+        """
+            Method to create many characters in a single transaction. The rows are sent
+            with multi-row INSERT ... RETURNING statements (batched by the driver)
+
+            :param AsyncSession session: database session
+            :param list[Character] characters: list of objects Character
+            :return: the created characters, in the same order
+        """
+        rows = [
+            character.model_dump(exclude={"character_id"}) for character in characters
+        ]
+        if not rows:
+            return []
+
+        created = (await session.scalars(
+            insert(Character).returning(Character, sort_by_parameter_order=True),
+            rows
+        )).all()
+        stats = await CharacterPowerStatsCrud.create_stats(
+            session, [character.character_id for character in created]
+        )
+        await session.commit()
+
+        # Attach the stats without loading them again
+        for character, character_stats in zip(created, stats):
+            set_committed_value(character, "stats", character_stats)
+            leaderboard.set(character.character_id, 0, character.character_type.name)
+
+        return created
     ###############################################################################################
 
 
     ###############################################################################################
     # Read
     @staticmethod
-    def read_characters(
+    async def read_characters(
         *, 
-        session: Session, 
+        session: AsyncSession, 
         character_id: int | None = None,
         offset: int | None = None,
-        limit: int | None = None
+        limit: int | None = None,
+        after_id: int | None = None,
+        include_powers: bool = False,
+        character_type: str | None = None,
+        min_age: int | None = None,
+        max_age: int | None = None,
+        name_prefix: str | None = None,
+        sort: str = "id",
+        after_value: str | int | None = None,
+        character_ids: list[int] | None = None
     ):
         """
             Method to read characters in database. Returns one character if
             a character_id is provided
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param int character_id: the character's ID
             :param int offset: an integer parameter for pagination
             :param int limit: the maximum number of characters returned
+            :param int after_id: keyset pagination, only characters after this ID are returned
+            :param bool include_powers: load the characters' powers (one extra query per page)
+            :param str character_type: only heroes or villains (hero or villain)
+            :param int min_age: the minimum age (included)
+            :param int max_age: the maximum age (included)
+            :param str name_prefix: the beginning of the name (case insensitive)
+            :param str sort: id, name, total_damage (the sum of the powers' damage), or
+            -name, -total_damage (descending)
+            :param str after_value: keyset pagination, the sort value of the last character
+            :param list[int] character_ids: batch fetch, only these characters are returned (in
+            the same order, the missing ones are left out; filters and pagination are ignored)
             :return: a list of characters or a character
         """
-        if not character_id:
-            query = select(Character).offset(offset).limit(limit)
-            result = session.exec(query).all()
+        if character_ids is not None:
+            # One query for all the IDs, the characters are returned in the order of the IDs
+            query = select(Character).where(id_in(Character.character_id, character_ids))
+            if include_powers:
+                query = query.options(selectinload(Character.powers))
+            characters = {
+                character.character_id: character
+                for character in (await session.exec(query)).all()
+            }
+            result = [
+                characters[character_id]
+                for character_id in character_ids if character_id in characters
+            ]
+
+        elif not character_id:
+            query = select(Character)
+            if character_type is not None:
+                query = query.where(Character.character_type == character_type)
+            if min_age is not None:
+                query = query.where(Character.age >= min_age)
+            if max_age is not None:
+                query = query.where(Character.age <= max_age)
+            if name_prefix:
+                pattern = escape_like(name_prefix) + "%"
+                query = query.where(Character.name.ilike(pattern, escape="\\"))
+            # Sorting by a stat: join the stats (instead of the default eager join)
+            if sort.lstrip("-") == "total_damage":
+                query = query.join(Character.stats).options(contains_eager(Character.stats))
+
+            query = order_and_seek(
+                query,
+                Character.character_id,
+                sort_column=CharacterCrud.SORT_COLUMNS.get(sort.lstrip("-")),
+                descending=sort.startswith("-"),
+                after_id=after_id,
+                after_value=after_value
+            )
+            query = query.offset(offset).limit(limit)
+            if include_powers:
+                query = query.options(selectinload(Character.powers))
+            result = (await session.exec(query)).all()
         
         else:
             query = select(Character).where(Character.character_id == character_id)
-            result = session.exec(query).first()
+            if include_powers:
+                query = query.options(selectinload(Character.powers))
+            result = (await session.exec(query)).first()
 
         return result
     ###############################################################################################
@@ -67,21 +176,99 @@ class CharacterCrud():
 
     ###############################################################################################
     @staticmethod
-    def update_character(
+    async def read_names(*, session: AsyncSession, character_ids: list[int]) -> dict[int, str]:
+        """
+            Method to get the names of some characters (e.g. the ones of a ranking)
+
+            :param AsyncSession session: database session
+            :param list[int] character_ids: the characters' IDs
+            :return: {character_id: name}
+        """
+        if not character_ids:
+            return {}
+
+        rows = (await session.exec(
+            select(Character.character_id, Character.name)
+            .where(Character.character_id.in_(character_ids))
+        )).all()
+
+        return dict(rows)
+    ###############################################################################################
+
+
+    ###############################################################################################
+    @staticmethod
+    async def search_characters(
+        *,
+        session: AsyncSession,
+        q: str,
+        limit: int = 10
+    ) -> list[tuple[Character, float]]:
+        """
+            Method to search characters by name and secret name, best matches first.
+            A character matches if (all conditions are GIN indexed):
+              - a word of the name or secret name starts with each word of q (full text)
+              - the name or secret name contains q (trigrams)
+              - a part of the name or secret name is similar to q, typos included (trigrams)
+
+            :param AsyncSession session: database session
+            :param str q: the text to search
+            :param int limit: the maximum number of characters returned
+            :return: a list of (Character, rank)
+        """
+        document = literal_column(SEARCH_DOCUMENT)
+        # LIKE wildcards in q are searched literally
+        pattern = "%" + escape_like(q) + "%"
+
+        conditions = [
+            Character.name.ilike(pattern, escape="\\"),
+            Character.secret_name.ilike(pattern, escape="\\"),
+            Character.name.op("%>")(q),
+            Character.secret_name.op("%>")(q),
+        ]
+        rank = func.greatest(
+            func.word_similarity(q, Character.name),
+            func.word_similarity(q, func.coalesce(Character.secret_name, ""))
+        )
+
+        # Each word of q as a prefix (e.g. "pet par" -> pet:* & par:*)
+        words = re.findall(r"[^\W_]+", q)
+        if words:
+            tsquery = func.to_tsquery(
+                literal_column("'simple'"), " & ".join(f"{word}:*" for word in words)
+            )
+            conditions.append(document.op("@@")(tsquery))
+            rank = rank + func.ts_rank(document, tsquery)
+
+        rank = rank.label("rank")
+        query = (
+            select(Character, rank)
+            .where(or_(*conditions))
+            .order_by(rank.desc(), Character.character_id)
+            .limit(limit)
+        )
+
+        return (await session.exec(query)).all()
+    ###############################################################################################
+
+
+    ###############################################################################################
+    @staticmethod
+    async def update_character(
         *, 
-        session: Session, 
+        session: AsyncSession, 
         character_id: int, 
         args: dict
     ):
         '''
             Method to update an existing character
             
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param int character_id: the character's ID
             :param dict args: a dict with the Character fields to be updated
             :return: the updated character
         '''
-        character_update = session.get(Character, character_id)
+        character_update = await session.get(Character, character_id)
 
         if not character_update:
             return None
@@ -92,10 +279,17 @@ class CharacterCrud():
             character_update.secret_name = args["secret_name"]
         if "age" in args:
             character_update.age = args["age"]
+
+        # Increment the row version in the UPDATE (version + 1), so concurrent updates get
+        # different versions (the new one is loaded by the refresh)
+        character_update.version = Character.version + 1
         
         session.add(character_update)
-        session.commit()
-        session.refresh(character_update)
+        await session.commit()
+        await session.refresh(character_update)
+
+        # Invalidate the cached character and their powers (includes the character's name)
+        await cache.invalidate(character_key(character_id), character_powers_key(character_id))
 
         return character_update
     ###############################################################################################
@@ -103,26 +297,29 @@ class CharacterCrud():
     
     ###############################################################################################
     @staticmethod
-    def delete_character(
+    async def delete_character(
         *,
-        session: Session,
+        session: AsyncSession,
         character_id: int
     ):
         '''
             Method to delete a character
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param int character_id: the character's ID
             :return: the deleted character
         '''
 
-        character_delete = session.get(Character, character_id)
+        character_delete = await session.get(Character, character_id)
 
         if not character_delete:
             return None
         
-        session.delete(character_delete)
-        session.commit()
+        await session.delete(character_delete)
+        await session.commit()
+        leaderboard.remove(character_id)
+
+        await cache.invalidate(character_key(character_id), character_powers_key(character_id))
         
         return character_delete
     ###############################################################################################
@@ -130,18 +327,21 @@ class CharacterCrud():
 
     ###############################################################################################
     @staticmethod
-    def get_heroes_or_villains(
-        session: Session,
+    async def get_heroes_or_villains(
+        session: AsyncSession,
         character_type: str,
         offset: int | None = None,
-        limit: int | None = None
+        limit: int | None = None,
+        after_id: int | None = None
     ) -> list[Character] | None:
         
         """
             Method to return all the heroes or all the villains from the database by passing the
-            character_type. Includes optional parameters offset and limit to allow pagination.
+            character_type. Includes optional parameters offset and limit to allow pagination,
+            and after_id for keyset pagination.
 
             :param str character_type: the character's category (hero or villain)
+            :param int after_id: only characters with a greater ID are returned
             :return: a list of Character or None
         """
 
@@ -150,10 +350,15 @@ class CharacterCrud():
             return None
         
         # Get the heroes or villains
-        result = session.exec(
-            select(Character).offset(offset).limit(limit)
+        query = (
+            select(Character)
             .where(Character.character_type == character_type)
-        ).all()
+            .order_by(Character.character_id)
+        )
+        if after_id is not None:
+            query = query.where(Character.character_id > after_id)
+
+        result = (await session.exec(query.offset(offset).limit(limit))).all()
 
         # Return the result
         return result
@@ -0,0 +1,79 @@
+#################
+# Export's CRUD #
+#################
+
+
+###################################################################################################
+# Imports
+import os
+from typing import AsyncIterator
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.models.characters import Character
+from app.models.powers import Powers
+###################################################################################################
+
+# Rows fetched from the server-side cursor at a time
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+###################################################################################################
+###################################################################################################
+class ExportCrud():
+
+    ###############################################################################################
+    # Read
+    @staticmethod
+    async def stream_characters(
+        *,
+        session: AsyncSession,
+        character_type: str | None = None,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> AsyncIterator[list[Character]]:
+        """
+            Method to stream every character with their powers, in batches read from a
+            server-side cursor. The powers of each batch are loaded with one extra query.
+
+            :param AsyncSession session: database session
+            :param str character_type: only heroes or villains (hero or villain), optional
+            :param int batch_size: the number of rows fetched at a time
+            :return: an async iterator of lists of Character
+        """
+        statement = (
+            select(Character)
+            .options(selectinload(Character.powers))
+            .order_by(Character.character_id)
+            .execution_options(yield_per=batch_size)
+        )
+        if character_type is not None:
+            statement = statement.where(Character.character_type == character_type)
+
+        result = await session.stream_scalars(statement)
+        async for characters in result.partitions():
+            yield characters
+
+
+    @staticmethod
+    async def stream_powers(
+        *,
+        session: AsyncSession,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> AsyncIterator[list[Powers]]:
+        """
+            Method to stream every power, in batches read from a server-side cursor
+
+            :param AsyncSession session: database session
+            :param int batch_size: the number of rows fetched at a time
+            :return: an async iterator of lists of Powers
+        """
+        statement = (
+            select(Powers)
+            .order_by(Powers.power_id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        result = await session.stream_scalars(statement)
+        async for powers in result.partitions():
+            yield powers
+###################################################################################################
+###################################################################################################
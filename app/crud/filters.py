@@ -0,0 +1,107 @@
+###############################
+# Filtering and sorting utils #
+###############################
+
+###################################################################################################
+# Imports
+import re
+from typing import Any
+from sqlalchemy import tuple_, literal, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+###################################################################################################
+
+
+###################################################################################################
+# LIKE patterns
+def escape_like(value: str) -> str:
+
+    """ Function to escape the LIKE wildcards of a value, so they are matched literally
+
+        :param str value: the text to be searched
+        :return: the escaped text (escaped with a backslash)
+    """
+
+    return re.sub(r"([\\%_])", r"\\\1", value)
+###################################################################################################
+
+
+###################################################################################################
+# Batch fetch by IDs
+
+# Maximum number of IDs of a batch fetch (GET ?ids=, POST /characters/batch-get)
+MAX_BATCH_IDS = 100
+# Largest ID (the ID columns are 32-bit integers)
+MAX_ID = 2**31 - 1
+
+
+def parse_id_list(value: str) -> list[int] | None:
+
+    """ Function to parse a comma separated list of IDs (e.g. "3,1,2"), removing the repeated
+        ones and keeping the order
+
+        :param str value: the IDs
+        :return: the list of IDs, or None if the list isn't valid (an ID that isn't made of
+        ASCII digits, or is out of 1..MAX_ID)
+    """
+
+    ids = [part.strip() for part in value.split(",")]
+    if not all(part.isascii() and part.isdigit() for part in ids):
+        return None
+
+    ids = [int(part) for part in ids]
+    if not all(1 <= part <= MAX_ID for part in ids):
+        return None
+
+    return list(dict.fromkeys(ids))
+
+
+def id_in(id_column, ids: list[int]):
+
+    """ Function to build the condition id_column = ANY(:ids). The IDs are sent as a single
+        array parameter, so the statement is the same for any number of IDs.
+
+        :param id_column: the primary key column
+        :param list[int] ids: the IDs
+        :return: the condition
+    """
+
+    return id_column == any_(bindparam("ids", ids, type_=ARRAY(Integer), unique=True))
+###################################################################################################
+
+
+###################################################################################################
+# Sorting with keyset pagination
+def order_and_seek(
+    query,
+    id_column,
+    sort_column=None,
+    descending: bool = False,
+    after_id: int | None = None,
+    after_value: Any = None
+):
+
+    """ Function to order a query by (sort_column, id_column) and, for keyset pagination,
+        keep only the rows after the last row of the previous page. The row comparison
+        (sort_column, id) > (after_value, after_id) is served by an index on
+        (sort_column[, id]).
+
+        :param query: the select statement
+        :param id_column: the primary key column (tie breaker)
+        :param sort_column: the column to sort by (None to sort by id_column only)
+        :param bool descending: sort in descending order
+        :param int after_id: the ID of the last row of the previous page
+        :param after_value: the sort_column value of the last row of the previous page
+        :return: the ordered select statement
+    """
+
+    columns = [id_column] if sort_column is None else [sort_column, id_column]
+
+    if after_id is not None:
+        if sort_column is None:
+            key, last = id_column, after_id
+        else:
+            key, last = tuple_(*columns), tuple_(literal(after_value), literal(after_id))
+        query = query.where(key < last if descending else key > last)
+
+    return query.order_by(*(column.desc() if descending else column for column in columns))
+###################################################################################################
@@ -0,0 +1,459 @@
+#################
+# Import's CRUD #
+#################
+
+
+###################################################################################################
+# Imports
+import os
+import csv
+import logging
+import orjson
+from typing import AsyncIterable, AsyncIterator
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import func, bindparam, text, or_, Integer
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from sqlalchemy.exc import DBAPIError
+from pydantic import ValidationError
+from app.models.characters import Character, CharacterBase
+from app.models.powers import Powers, PowersBase
+from app.models.character_power import CharacterPower
+from app.models.imports import ImportProgress
+from app.crud.character_power_stats import CharacterPowerStatsCrud
+from app.cache.leaderboard import leaderboard
+from app.cache.cache import cache, character_key, character_powers_key, power_key
+###################################################################################################
+
+# Rows (of each kind) buffered before they are written and committed
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+# Error messages kept in the progress report
+MAX_ERROR_SAMPLES = 20
+
+logger = logging.getLogger("app.imports")
+
+###################################################################################################
+# File parsing
+#
+# Each line (NDJSON) or row (CSV, with a header) is a power, a character or a link, told apart
+# by its fields:
+#   power:     power_name, power_damage, power_id (opt)
+#   character: name, secret_name, age, character_type, character_id (opt), powers (opt, NDJSON)
+#   link:      character_id, power_id
+# The nested powers of a character are upserted by name (their power_id is ignored, it may
+# belong to another power in the target database) and linked to the ID their name gets, also
+# when the character has no character_id (it's linked to the ID it gets when it's inserted).
+# The lines of GET /export/characters.ndjson and GET /export/powers.ndjson can be imported as is.
+# The files are read as a stream of chunks, so only one batch of rows is kept in memory.
+
+def detect_format(name: str | None) -> str:
+    if name and (name.lower().endswith(".csv") or "text/csv" in name.lower()):
+        return "csv"
+    return "ndjson"
+
+
+async def read_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+
+    """ Function to split a stream of chunks (a request body or a file) into lines """
+
+    pending = b""
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+async def read_records(
+    chunks: AsyncIterable[bytes],
+    file_format: str
+) -> AsyncIterator[tuple[int, dict | str]]:
+
+    """ Function to read a stream one record at a time
+
+        :param chunks: the stream of bytes (a request body or a file)
+        :param str file_format: ndjson or csv (one row per line, with a header)
+        :return: an async iterator of (line number, record), or (line number, error message)
+        for the lines that can't be parsed
+    """
+
+    header = None
+    line_number = 0
+
+    async for line in read_lines(chunks):
+        line_number += 1
+        line = line.rstrip(b"\r")
+        if not line.strip():
+            continue
+
+        if file_format == "csv":
+            try:
+                values = next(csv.reader([line.decode("utf-8").lstrip("\ufeff")]))
+            except (UnicodeDecodeError, csv.Error) as error:
+                yield line_number, f"invalid CSV: {error}"
+                continue
+            if header is None:
+                header = values
+                continue
+            # Empty cells are missing values
+            yield line_number, {
+                key: value for key, value in zip(header, values) if value != ""
+            }
+            continue
+
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError as error:
+            yield line_number, f"invalid JSON: {error}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, "expected a JSON object"
+            continue
+        yield line_number, record
+
+
+def parse_record(record: dict) -> list[tuple[str, dict]]:
+
+    """ Function to validate a record and turn it into rows
+
+        :param dict record: the parsed line
+        :return: a list of (kind, row), kind being power, character or link
+        :raises ValueError: if the record isn't valid
+    """
+
+    if "power_name" in record:
+        power = PowersBase.model_validate(record)
+        row = power.model_dump()
+        if record.get("power_id") is not None:
+            row["power_id"] = int(record["power_id"])
+        return [("power", row)]
+
+    if "name" in record:
+        character = CharacterBase.model_validate(record)
+        row = character.model_dump()
+        if record.get("character_id") is not None:
+            row["character_id"] = int(record["character_id"])
+
+        rows = [("character", row)]
+        # Powers nested by the export, imported with their links (by power_name, and by the
+        # character's row: a character without character_id gets its ID when it's inserted)
+        for power in record.get("powers") or []:
+            power_row = PowersBase.model_validate(power).model_dump()
+            rows.append(("power", power_row))
+            rows.append(("link", {"character": row, "power_name": power_row["power_name"]}))
+        return rows
+
+    if "character_id" in record and "power_id" in record:
+        return [("link", {
+            "character_id": int(record["character_id"]),
+            "power_id": int(record["power_id"])
+        })]
+
+    raise ValueError("unknown record, expected a power, a character or a link")
+###################################################################################################
+
+
+###################################################################################################
+###################################################################################################
+class ImportCrud():
+
+    ###############################################################################################
+    # Upserts
+    @staticmethod
+    async def upsert_powers(
+        *,
+        session: AsyncSession,
+        rows: list[dict]
+    ) -> tuple[dict[str, int], list[int]]:
+        """
+            Method to insert powers, updating the damage of the ones whose power_name
+            already exists. The powers whose damage doesn't change aren't written (they keep
+            their version, and their ETag).
+
+            :param AsyncSession session: database session
+            :param list[dict] rows: the powers (power_name, power_damage, power_id opt)
+            :return: the IDs of every power by power_name, and the IDs of the inserted or
+            changed powers
+        """
+        # A statement can't update the same row twice: keep the last row of each name
+        rows = list({row["power_name"]: row for row in rows}.values())
+
+        changed = {}
+        for group in (
+            [row for row in rows if "power_id" in row],
+            [row for row in rows if "power_id" not in row]
+        ):
+            if not group:
+                continue
+            statement = insert(Powers)
+            statement = (
+                statement
+                .on_conflict_do_update(
+                    index_elements=["power_name"],
+                    set_={
+                        "power_damage": statement.excluded.power_damage,
+                        "version": Powers.version + 1
+                    },
+                    where=Powers.power_damage.is_distinct_from(statement.excluded.power_damage)
+                )
+                .returning(Powers.power_name, Powers.power_id)
+            )
+            changed.update((await session.execute(statement, group)).tuples().all())
+
+        # The unchanged powers aren't returned by the upsert
+        power_ids = dict(changed)
+        unchanged = [row["power_name"] for row in rows if row["power_name"] not in changed]
+        if unchanged:
+            power_ids.update((await session.execute(
+                select(Powers.power_name, Powers.power_id)
+                .where(Powers.power_name.in_(unchanged))
+            )).tuples().all())
+
+        return power_ids, list(changed.values())
+
+
+    @staticmethod
+    async def upsert_characters(*, session: AsyncSession, rows: list[dict]) -> list[int]:
+        """
+            Method to insert characters, replacing the ones whose character_id already exists
+            (unless nothing changes, so they keep their version). Characters without
+            character_id are always inserted, and their rows get the new character_id.
+
+            :param AsyncSession session: database session
+            :param list[dict] rows: the characters
+            :return: the IDs of the inserted or changed characters
+        """
+        # A statement can't update the same row twice: keep the last row of each ID
+        with_id = list(
+            {row["character_id"]: row for row in rows if "character_id" in row}.values()
+        )
+        without_id = [row for row in rows if "character_id" not in row]
+
+        character_ids = []
+        if with_id:
+            statement = insert(Character)
+            statement = (
+                statement
+                .on_conflict_do_update(
+                    index_elements=["character_id"],
+                    set_={
+                        "name": statement.excluded.name,
+                        "secret_name": statement.excluded.secret_name,
+                        "age": statement.excluded.age,
+                        "character_type": statement.excluded.character_type,
+                        "version": Character.version + 1
+                    },
+                    where=or_(
+                        Character.name.is_distinct_from(statement.excluded.name),
+                        Character.secret_name.is_distinct_from(statement.excluded.secret_name),
+                        Character.age.is_distinct_from(statement.excluded.age),
+                        Character.character_type.is_distinct_from(
+                            statement.excluded.character_type
+                        )
+                    )
+                )
+                .returning(Character.character_id)
+            )
+            character_ids.extend((await session.scalars(statement, with_id)).all())
+
+        if without_id:
+            statement = insert(Character).returning(
+                Character.character_id, sort_by_parameter_order=True
+            )
+            new_ids = (await session.scalars(statement, without_id)).all()
+            # Set the new IDs in the rows, for the links of their nested powers
+            for row, character_id in zip(without_id, new_ids):
+                row["character_id"] = character_id
+            character_ids.extend(new_ids)
+
+        return character_ids
+
+
+    @staticmethod
+    async def insert_links(*, session: AsyncSession, rows: list[dict]) -> int:
+        """
+            Method to link characters and powers. The pairs are sent as two arrays (unnest),
+            and the ones already linked or pointing to a missing row are skipped.
+
+            :param AsyncSession session: database session
+            :param list[dict] rows: the links (character_id, power_id)
+            :return: the number of links created
+        """
+        links = (
+            func.unnest(
+                bindparam("character_ids", [row["character_id"] for row in rows],
+                          type_=ARRAY(Integer)),
+                bindparam("power_ids", [row["power_id"] for row in rows], type_=ARRAY(Integer))
+            )
+            .table_valued("character_id", "power_id")
+            .render_derived(name="links")
+        )
+        existing_links = (
+            select(links.c.character_id, links.c.power_id)
+            .join(Character, Character.character_id == links.c.character_id)
+            .join(Powers, Powers.power_id == links.c.power_id)
+        )
+        statement = (
+            insert(CharacterPower)
+            .from_select(["character_id", "power_id"], existing_links)
+            .on_conflict_do_nothing()
+        )
+        result = await session.execute(statement)
+        return result.rowcount
+
+
+    @staticmethod
+    async def sync_sequences(*, session: AsyncSession):
+        """
+            Method to move the ID sequences past the imported IDs, so the next rows
+            created by the API don't collide with them
+
+            :param AsyncSession session: database session
+        """
+        for table, column in (("character", "character_id"), ("powers", "power_id")):
+            await session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table}\"', '{column}'), "
+                f"COALESCE((SELECT MAX({column}) FROM \"{table}\"), 0) + 1, false)"
+            ))
+        await session.commit()
+
+
+    ###############################################################################################
+    # Import
+    @staticmethod
+    async def write_batch(
+        *,
+        session: AsyncSession,
+        batch: dict[str, list[dict]],
+        progress: ImportProgress
+    ):
+        """
+            Method to write and commit a batch (powers, then characters, then links), and
+            recompute the stats of the characters it touches. The links by power_name (the
+            nested powers of a character) get the ID of the upserted power with that name
+            and the ID of their character's row.
+            If the batch fails (e.g. a power_id already used by another name, or an ID or age
+            out of range) it's rolled back and its rows are counted as errors.
+
+            :param AsyncSession session: database session
+            :param dict batch: the rows of each kind
+            :param ImportProgress progress: the progress to be updated
+        """
+        try:
+            power_ids_by_name = {}
+            power_ids = []
+            character_ids = []
+            links = 0
+            if batch["power"]:
+                power_ids_by_name, power_ids = await ImportCrud.upsert_powers(
+                    session=session, rows=batch["power"]
+                )
+            if batch["character"]:
+                character_ids = await ImportCrud.upsert_characters(
+                    session=session, rows=batch["character"]
+                )
+            # Links of the nested powers: the IDs of their character's row and of their name
+            batch["link"] = [
+                {
+                    "character_id": row["character"]["character_id"],
+                    "power_id": power_ids_by_name[row["power_name"]]
+                } if "power_name" in row else row
+                for row in batch["link"]
+            ]
+            if batch["link"]:
+                links = await ImportCrud.insert_links(session=session, rows=batch["link"])
+            # Stats of the new or linked characters and of the holders of the changed powers
+            if character_ids or power_ids or links:
+                await CharacterPowerStatsCrud.rebuild(
+                    session,
+                    character_ids=character_ids + [row["character_id"] for row in batch["link"]],
+                    power_ids=power_ids
+                )
+            await session.commit()
+
+        except DBAPIError as error:
+            await session.rollback()
+            progress.errors += sum(len(rows) for rows in batch.values())
+            if len(progress.error_samples) < MAX_ERROR_SAMPLES:
+                progress.error_samples.append(
+                    f"batch ending at line {progress.lines} failed: {error.orig}"
+                )
+
+        else:
+            progress.powers += len(power_ids)
+            progress.characters += len(character_ids)
+            progress.links += links
+            progress.skipped_links += len(batch["link"]) - links
+
+            # Invalidate the cached rows (the cached pages and stats of the holders of a
+            # changed power expire with the TTL)
+            await cache.invalidate(
+                *(power_key(power_id) for power_id in power_ids),
+                *(character_key(character_id) for character_id in character_ids),
+                *(character_powers_key(character_id) for character_id in character_ids),
+                *(character_key(row["character_id"]) for row in batch["link"]),
+                *(character_powers_key(row["character_id"]) for row in batch["link"])
+            )
+            if power_ids:
+                await cache.invalidate_list("powers")
+
+        for rows in batch.values():
+            rows.clear()
+
+
+    @staticmethod
+    async def import_records(
+        *,
+        session: AsyncSession,
+        records: AsyncIterable[tuple[int, dict | str]],
+        batch_size: int = IMPORT_BATCH_SIZE
+    ) -> AsyncIterator[ImportProgress]:
+        """
+            Method to import the records of a file in batches. Only one batch is kept in
+            memory, and it's committed as soon as one of its kinds reaches batch_size rows.
+            Links are written after the powers and characters of the same batch, so a link
+            must come after (or in the same batch as) the rows it points to.
+
+            :param AsyncSession session: database session
+            :param records: the records, as returned by read_records
+            :param int batch_size: the rows of each kind written per transaction
+            :return: an async iterator of the progress, after every batch and at the end
+        """
+        progress = ImportProgress()
+        batch = {"power": [], "character": [], "link": []}
+        explicit_ids = False
+
+        async for line_number, record in records:
+            progress.lines += 1
+            try:
+                if isinstance(record, str):
+                    raise ValueError(record)
+                rows = parse_record(record)
+            except (ValueError, TypeError, ValidationError) as error:
+                progress.errors += 1
+                if len(progress.error_samples) < MAX_ERROR_SAMPLES:
+                    progress.error_samples.append(f"line {line_number}: {error}")
+                continue
+
+            for kind, row in rows:
+                batch[kind].append(row)
+                if f"{kind}_id" in row and kind != "link":
+                    explicit_ids = True
+
+            if max(len(kind_rows) for kind_rows in batch.values()) >= batch_size:
+                await ImportCrud.write_batch(session=session, batch=batch, progress=progress)
+                logger.info("Import progress: %s", progress)
+                yield progress
+
+        await ImportCrud.write_batch(session=session, batch=batch, progress=progress)
+        if explicit_ids:
+            await ImportCrud.sync_sequences(session=session)
+        # The import may touch any character: rebuild the leaderboard once, at the end
+        await leaderboard.rebuild(session)
+
+        progress.done = True
+        yield progress
+###################################################################################################
+###################################################################################################
@@ -0,0 +1,150 @@
+###########################
+# Keyset pagination utils #
+###########################
+
+###################################################################################################
+# Imports
+import base64
+import binascii
+import orjson
+from typing import Any
+from fastapi import HTTPException, status
+from app.crud.filters import MAX_ID
+###################################################################################################
+
+
+###################################################################################################
+# Cursor encoding
+def encode_cursor(last_id: int, sort: str | None = None, last_value: Any = None) -> str:
+
+    """ Function to build an opaque cursor from the last row of a page
+
+        :param int last_id: the ID of the last row returned
+        :param str sort: the page's sort order, when it isn't by ID (e.g. "-power_damage")
+        :param last_value: the value of the sort column in the last row returned
+        :return: the cursor (str)
+    """
+
+    value = f"id:{last_id}"
+    if sort is not None:
+        value += f":{sort}:" + orjson.dumps(last_value).decode()
+
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+###################################################################################################
+
+
+###################################################################################################
+# Cursor decoding
+def _decode(cursor: str) -> list[str] | None:
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        value = base64.urlsafe_b64decode(cursor + padding).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+    # id:N or id:N:sort:value, N being an ID (ASCII digits, up to MAX_ID)
+    parts = value.split(":", 3)
+    if parts[0] != "id" or len(parts) not in (2, 4):
+        return None
+    if not (parts[1].isascii() and parts[1].isdigit()) or int(parts[1]) > MAX_ID:
+        return None
+
+    return parts
+
+
+def decode_cursor(cursor: str) -> int | None:
+
+    """ Function to get the last ID of a page sorted by ID from an opaque cursor
+
+        :param str cursor: the cursor returned in a previous page
+        :return: the ID (int) or None if the cursor is invalid
+    """
+
+    parts = _decode(cursor)
+    if parts is None or len(parts) != 2:
+        return None
+
+    return int(parts[1])
+
+
+def decode_sort_cursor(cursor: str, sort: str, value_type: type) -> tuple[int, Any] | None:
+
+    """ Function to get the last ID and sort value of a sorted page from an opaque cursor
+
+        :param str cursor: the cursor returned in a previous page
+        :param str sort: the sort order of the requested page (it must match the cursor's)
+        :param type value_type: the type of the sort column's values (int or str)
+        :return: (ID, sort value) or None if the cursor is invalid
+    """
+
+    parts = _decode(cursor)
+    if parts is None or len(parts) != 4 or parts[2] != sort:
+        return None
+
+    try:
+        last_value = orjson.loads(parts[3])
+    except orjson.JSONDecodeError:
+        return None
+    if type(last_value) is not value_type:
+        return None
+    # The integer columns are 32-bit
+    if value_type is int and not -MAX_ID - 1 <= last_value <= MAX_ID:
+        return None
+
+    return int(parts[1]), last_value
+###################################################################################################
+
+
+###################################################################################################
+# Cursor query parameters (422 if invalid)
+def get_cursor_id(cursor: str | None) -> int | None:
+
+    """ Function to get the last ID of the previous page sorted by ID from the cursor query
+        parameter
+
+        :param str cursor: the cursor query parameter (None on the first page)
+        :return: the ID (int) or None on the first page
+        :raises HTTPException: 422 if the cursor is invalid
+    """
+
+    if cursor is None:
+        return None
+
+    after_id = decode_cursor(cursor)
+    if after_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid cursor!"
+        )
+    return after_id
+
+
+def get_sort_cursor(
+    cursor: str | None,
+    sort: str,
+    value_type: type | None
+) -> tuple[int | None, Any]:
+
+    """ Function to get the last ID and sort value of the previous page from the cursor
+        query parameter
+
+        :param str cursor: the cursor query parameter (None on the first page)
+        :param str sort: the sort order of the requested page
+        :param type value_type: the type of the sort column's values (None when sorted by ID)
+        :return: (ID, sort value), or (None, None) on the first page
+        :raises HTTPException: 422 if the cursor is invalid
+    """
+
+    if value_type is None:
+        return get_cursor_id(cursor), None
+    if cursor is None:
+        return None, None
+
+    last_row = decode_sort_cursor(cursor, sort, value_type)
+    if last_row is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid cursor!"
+        )
+    return last_row
+###################################################################################################
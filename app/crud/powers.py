@@ -4,8 +4,17 @@
 
 ###################################################################################################
 # Imports
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlalchemy import func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
 from app.models.powers import Powers, PowerUpdate
+from app.models.character_power import CharacterPower
+from app.models.characters import Character
+from app.crud.character_power_stats import CharacterPowerStatsCrud
+from app.cache.cache import cache, power_key, character_key, character_powers_key
+from app.cache.leaderboard import leaderboard
+from app.crud.filters import escape_like, order_and_seek, id_in
 ###################################################################################################
 
 
@@ -13,74 +22,206 @@ from app.models.powers import Powers, PowerUpdate
 ###################################################################################################
 class PowersCrud:
 
+    # Columns of the sort orders (besides the default, by ID)
+    SORT_COLUMNS = {"name": Powers.power_name, "damage": Powers.power_damage}
+
 ###################################################################################################
 # CREATE
     @staticmethod
-    def create_power(
-        session: Session,
+    async def create_power(
+        session: AsyncSession,
         power: Powers
     ) -> Powers:
         
         """ Method to create a new power
             
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param Powers power: Object Powers
         """
 
-        # Add the power to the session and return it
+        # Add the power to the session
         session.add(power)
-        session.commit()
-        session.refresh(power)
+        await session.commit()
+        await session.refresh(power)
+
+        # Invalidate the cached powers pages and return the power
+        await cache.invalidate_list("powers")
 
         return power
+
+
+    @staticmethod
+    async def create_powers(
+        session: AsyncSession,
+        powers: list[Powers]
+    ) -> list[Powers | None]:
+
+        """ Method to create many powers in a single transaction. The rows are sent with
+            multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING statements, so the powers
+            whose power_name already exists are skipped instead of aborting the transaction.
+
+            :param AsyncSession session: database session
+            :param list[Powers] powers: list of objects Powers
+            :return: a list with the created power, or None if its power_name already
+            existed, for each given power (in the same order)
+        """
+
+        rows = [power.model_dump(exclude={"power_id"}) for power in powers]
+        if not rows:
+            return []
+
+        # Insert the powers (the conflicting rows aren't returned)
+        statement = (
+            insert(Powers)
+            .on_conflict_do_nothing(index_elements=["power_name"])
+            .returning(Powers)
+        )
+        created = (await session.scalars(statement, rows)).all()
+        await session.commit()
+
+        # Match the created powers with the given ones (a repeated name is only created once)
+        created_by_name = {power.power_name: power for power in created}
+        results = []
+        for power in powers:
+            results.append(created_by_name.pop(power.power_name, None))
+
+        if created:
+            await cache.invalidate_list("powers")
+
+        return results
 ###################################################################################################
 
 
 ###################################################################################################
 # READ
     @staticmethod
-    def read_powers(
+    async def read_powers(
         *,
-        session: Session,
+        session: AsyncSession,
         power_id: int | None = None,
         offset: int | None = None,
-        limit: int | None = None
-    ) -> list[Powers] | Powers:
+        limit: int | None = None,
+        after_id: int | None = None,
+        min_damage: int | None = None,
+        max_damage: int | None = None,
+        name_prefix: str | None = None,
+        sort: str = "id",
+        after_value: int | str | None = None,
+        with_counts: bool = False,
+        power_ids: list[int] | None = None
+    ) -> list[Powers] | list[tuple[Powers, int]] | Powers:
         
         """ Method to return all the powers in the database or only one power
             by passing its power_id. The optional parameters offset and limit
             allow pagination and limiting the results.
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param int (opt) power_id: the power's ID
             :param int (opt) offset: parameter for pagination
             :param int (opt) limit: the maximum number of powers returned
-            :return: list of objects Powers or a object Powers
+            :param int (opt) after_id: keyset pagination, only powers after this ID are returned
+            :param int (opt) min_damage: the minimum damage (included)
+            :param int (opt) max_damage: the maximum damage (included)
+            :param str (opt) name_prefix: the beginning of the name (case insensitive)
+            :param str (opt) sort: id, name, -name, damage or -damage (descending)
+            :param (opt) after_value: keyset pagination, the sort value of the last power
+            :param bool (opt) with_counts: also return the number of characters that hold each
+            power (counted in the same query, only for the powers of the page)
+            :param list[int] (opt) power_ids: batch fetch, only these powers are returned (in
+            the same order, the missing ones are left out; filters and pagination are ignored)
+            :return: list of objects Powers (or (Powers, count) tuples) or a object Powers
         """
 
         # Verify if the user give a power_id and return the result
 
         # All results (or the defined with limit)
         if not power_id:
-            resultado = session.exec(
-                select(Powers).offset(offset).limit(limit)
-            ).all()
+            query = select(Powers)
+            if with_counts:
+                character_count = (
+                    select(func.count())
+                    .where(CharacterPower.power_id == Powers.power_id)
+                    .scalar_subquery()
+                )
+                query = select(Powers, character_count)
+
+            # Batch fetch: one query for all the IDs, returned in the order of the IDs
+            if power_ids is not None:
+                rows = (await session.exec(query.where(id_in(Powers.power_id, power_ids)))).all()
+                powers = {(row[0] if with_counts else row).power_id: row for row in rows}
+                return [powers[power_id] for power_id in power_ids if power_id in powers]
+
+            if min_damage is not None:
+                query = query.where(Powers.power_damage >= min_damage)
+            if max_damage is not None:
+                query = query.where(Powers.power_damage <= max_damage)
+            if name_prefix:
+                pattern = escape_like(name_prefix) + "%"
+                query = query.where(Powers.power_name.ilike(pattern, escape="\\"))
+
+            query = order_and_seek(
+                query,
+                Powers.power_id,
+                sort_column=PowersCrud.SORT_COLUMNS.get(sort.lstrip("-")),
+                descending=sort.startswith("-"),
+                after_id=after_id,
+                after_value=after_value
+            )
+
+            resultado = (await session.exec(query.offset(offset).limit(limit))).all()
         
         # Only one result
         else:
-            resultado = session.exec(
+            resultado = (await session.exec(
                 select(Powers).where(Powers.power_id == power_id)
-            ).first()
+            )).first()
 
         return resultado
+
+
+    @staticmethod
+    async def read_power_characters(
+        session: AsyncSession,
+        power_id: int,
+        limit: int | None = None,
+        after_id: int | None = None
+    ) -> list[Character] | None:
+
+        """ Method to return the characters that hold a power, ordered by character_id
+            (served by the (power_id, character_id) index of the link table)
+
+            :param AsyncSession session: database session
+            :param int power_id: the power's ID
+            :param int (opt) limit: the maximum number of characters returned
+            :param int (opt) after_id: keyset pagination, only characters with a greater ID
+            are returned
+            :return: list of objects Character, or None if the power doesn't exist
+        """
+
+        query = (
+            select(Character)
+            .join(CharacterPower, CharacterPower.character_id == Character.character_id)
+            .where(CharacterPower.power_id == power_id)
+            .order_by(CharacterPower.character_id)
+        )
+        if after_id is not None:
+            query = query.where(CharacterPower.character_id > after_id)
+
+        characters = (await session.exec(query.limit(limit))).all()
+
+        # An empty page may be an unknown power
+        if not characters and await session.get(Powers, power_id) is None:
+            return None
+
+        return characters
 ###################################################################################################
 
 
 ###################################################################################################
 # UPDATE
     @staticmethod
-    def update_power(
-        session: Session,
+    async def update_power(
+        session: AsyncSession,
         power_id: int,
         power_update: dict
     ):
@@ -88,25 +229,44 @@ class PowersCrud:
         """ Method to update a power by passing its power_id and a PowerUpdate with
             the fields to be modified.
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param int power_id: the power's ID
             :param dict power_update: a dict with the fields to be modified
             :return: the updated power
         """
 
-        # Get the power to be updated
-        power_to_update = session.get(Powers, power_id)
+        # Get the power to be updated, locked until the commit: the stats are updated with
+        # the difference between its old and new damage
+        power_to_update = (await session.exec(
+            select(Powers).where(Powers.power_id == power_id).with_for_update()
+        )).first()
 
         # Return None if the power doesn't exist
         if not power_to_update:
             return None
         
-        # Update the power
+        # Update the power and the stats of the characters that have it
+        old_damage = power_to_update.power_damage
         power_to_update.sqlmodel_update(power_update)
+        # Increment the row version in the UPDATE (loaded by the refresh after the commit)
+        power_to_update.version = Powers.version + 1
 
         session.add(power_to_update)
-        session.commit()
-        session.refresh(power_to_update)
+        await session.flush()
+        totals = await CharacterPowerStatsCrud.change_damage(
+            session, power_id, old_damage, power_to_update.power_damage
+        )
+        await session.commit()
+        leaderboard.set_many(totals)
+        await session.refresh(power_to_update)
+
+        # Invalidate the cached power, powers pages and powers of the characters that have it
+        # (the holders are returned by the stats update)
+        await PowersCrud._invalidate_power(
+            session=session,
+            power_id=power_id,
+            character_ids=[character_id for character_id, _ in totals]
+        )
 
         # Returns the updated power
         return power_to_update
@@ -116,30 +276,76 @@ class PowersCrud:
 ###################################################################################################
 # DELETE
     @staticmethod
-    def delete_power(
-        session: Session,
+    async def delete_power(
+        session: AsyncSession,
         power_id: int
     ):
         """ Method to delete a power by passing its power_id.
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param int power_id: the power's ID
             :return: the deleted power
         """
 
-        # Get the power to be deleted
-        power_to_delete = session.get(Powers, power_id)
+        # Get the power to be deleted, locked until the commit (its damage is subtracted from
+        # the stats of its holders)
+        power_to_delete = (await session.exec(
+            select(Powers).where(Powers.power_id == power_id).with_for_update()
+        )).first()
 
         # Return None if the power doesn't exist
         if power_to_delete is None:
             return None
         
-        # Delete the power and return it
-        session.delete(power_to_delete)
-        session.commit()
+        # Update the stats of the characters that have it (their links are deleted with the
+        # power, so the holders returned here are the ones to invalidate), then delete the
+        # power and return it
+        totals = await CharacterPowerStatsCrud.remove_power_from_holders(
+            session, power_id, power_to_delete.power_damage
+        )
+        await session.delete(power_to_delete)
+        await session.commit()
+        leaderboard.set_many(totals)
+
+        await PowersCrud._invalidate_power(
+            session=session,
+            power_id=power_id,
+            character_ids=[character_id for character_id, _ in totals]
+        )
 
         return power_to_delete
 ###################################################################################################
 
+
+###################################################################################################
+# CACHE
+    @staticmethod
+    async def _invalidate_power(
+        session: AsyncSession,
+        power_id: int,
+        character_ids: list[int] | None = None
+    ):
+
+        """ Method to remove a power from the cache, along with the powers pages and the
+            cached powers (and stats) of every character that has it.
+
+            :param AsyncSession session: database session
+            :param int power_id: the power's ID
+            :param list[int] character_ids: the characters that have it (queried if None)
+        """
+
+        if character_ids is None:
+            character_ids = (await session.exec(
+                select(CharacterPower.character_id).where(CharacterPower.power_id == power_id)
+            )).all()
+
+        await cache.invalidate(
+            power_key(power_id),
+            *(character_powers_key(character_id) for character_id in character_ids),
+            *(character_key(character_id) for character_id in character_ids)
+        )
+        await cache.invalidate_list("powers")
+###################################################################################################
+
 ###################################################################################################
 ###################################################################################################
\ No newline at end of file
@@ -4,10 +4,11 @@
 
 ###################################################################################################
 # Imports
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from app.models.users import User, UserIn, UserOut
-from app.auth.hashing import hash_password
+from app.auth.hashing import hash_password_async
 ###################################################################################################
 
 
@@ -18,19 +19,20 @@ class UserCrud:
 ###################################################################################################
 # Create users
     @staticmethod
-    def create_user(session: Session, user: UserIn) -> UserOut | None:
+    async def create_user(session: AsyncSession, user: UserIn) -> UserOut | None:
 
         """ Method to create new users in database. Receives an UserIn, then it hash the password
             using hash_password and finally, returns the created user without password.
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param UserIn user: object with username and password
             :return: a UserOut object (user without password) or None if the username already
             exists
+            :raises HashingPoolFull: if the hashing pool can't accept more jobs
         """
 
-        # Hash the password passed in user
-        hashed_password = hash_password(user.password)
+        # Hash the password passed in user (in the hashing pool)
+        hashed_password = await hash_password_async(user.password)
 
         # Create a object User (database user)
         user_db = User(username=user.username, hash_password=hashed_password)
@@ -38,14 +40,14 @@ class UserCrud:
         try:
             # Add user in database
             session.add(user_db)
-            session.commit()
-            session.refresh(user_db)
+            await session.commit()
+            await session.refresh(user_db)
 
             # Return an UserOut
             return UserOut(username=user_db.username, user_id=user_db.user_id)
         
         except IntegrityError:
-            session.rollback()
+            await session.rollback()
             return None
 ###################################################################################################
 
@@ -53,19 +55,19 @@ class UserCrud:
 ###################################################################################################
 # Get user hashed password
     @staticmethod
-    def get_hashed_password(session: Session, username: str) -> str | None:
+    async def get_hashed_password(session: AsyncSession, username: str) -> str | None:
 
         """ Method to get a user's hashed_password by passing the username
 
-            :param Session session: database session
+            :param AsyncSession session: database session
             :param str username: the user's username
             :return: the hashed password (str)
         """
 
         # Get the user
-        user = session.exec(
+        user = (await session.exec(
             select(User).where(User.username == username)
-        ).first()
+        )).first()
 
         # Return None if the user doesn't exist
         if user is None:
@@ -1,16 +1,112 @@
 import os
+import time
 from typing import Annotated
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 from pathlib import Path
+from app.monitoring.queries import instrument_engine
+from app.monitoring.metrics import (
+    DB_POOL_CHECKOUT_WAIT_SECONDS, DB_POOL_IN_USE, DB_POOL_CONFIGURED_SIZE
+)
 
 # Obtención del string connection desde .env
 env_path = Path(__file__).resolve().parents[2] / ".env"
 load_dotenv(dotenv_path=env_path)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Creación de engine
-engine = create_engine(DATABASE_URL, echo=False) # In development, turn echo=True
+# Configuración del pool de conexiones (por engine)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))        # segundos
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))        # segundos, -1 para desactivar
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", 0)) # milisegundos, 0 sin límite
+
+# String connection para el driver asíncrono (asyncpg)
+def get_async_database_url(database_url: str) -> str:
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if database_url.startswith(prefix):
+            return "postgresql+asyncpg://" + database_url[len(prefix):]
+    return database_url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or get_async_database_url(DATABASE_URL)
+
+
+# Pool que mide el tiempo de espera para obtener una conexión
+def instrumented_pool(pool_class, engine_name: str):
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                DB_POOL_CHECKOUT_WAIT_SECONDS.labels(engine=engine_name).observe(
+                    time.perf_counter() - start
+                )
+    return InstrumentedPool
+
+
+# Argumentos de conexión para el statement timeout (solo PostgreSQL)
+def get_connect_args(database_url: str) -> dict:
+    if not DB_STATEMENT_TIMEOUT or not database_url.startswith(("postgres", "postgresql")):
+        return {}
+    if "+asyncpg" in database_url:
+        return {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT)}}
+    return {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT}"}
+
+
+pool_settings = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+# Creación de engine (síncrono, usado por Alembic y create_all)
+engine = create_engine(
+    DATABASE_URL,
+    echo=False, # In development, turn echo=True
+    poolclass=instrumented_pool(QueuePool, "sync"),
+    connect_args=get_connect_args(DATABASE_URL),
+    **pool_settings
+)
+
+# Creación de engine asíncrono (usado por los endpoints)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    poolclass=instrumented_pool(AsyncAdaptedQueuePool, "async"),
+    connect_args=get_connect_args(ASYNC_DATABASE_URL),
+    **pool_settings
+)
+
+# Métricas del pool. Las conexiones en uso se actualizan con los eventos del pool (los
+# eventos se registran en el engine, así siguen activos luego de engine.dispose()) y se
+# suman entre los workers cuando las métricas son multiproceso
+def instrument_pool(pool_engine, engine_name: str):
+    in_use = DB_POOL_IN_USE.labels(engine=engine_name)
+    event.listen(pool_engine, "checkout", lambda *args: in_use.inc())
+    event.listen(pool_engine, "checkin", lambda *args: in_use.dec())
+    DB_POOL_CONFIGURED_SIZE.labels(engine=engine_name).set(DB_POOL_SIZE)
+
+
+instrument_pool(engine, "sync")
+instrument_pool(async_engine.sync_engine, "async")
+
+# Métricas de consultas por request
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
+# Fábrica de sesiones asíncronas. expire_on_commit=False evita recargas implícitas
+# (lazy loads) de los objetos luego de un commit, que no están permitidas en asyncio
+async_session_maker = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 # Creación de sesión
 def get_session():
@@ -18,6 +114,12 @@ def get_session():
         yield session
 
 
+# Creación de sesión asíncrona
+async def get_async_session():
+    async with async_session_maker() as session:
+        yield session
+
+
 # Creación de base de datos y tablas
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
@@ -0,0 +1,63 @@
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text, inspect
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import SQLModel
+from app.db.database import engine, create_db_and_tables
+from app.models import characters, powers, character_power, users
+
+# Configuración de Alembic
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+def get_alembic_config() -> Config:
+    return Config(str(ALEMBIC_INI))
+
+
+# Revisión de las bases creadas con create_all al iniciar la API, antes de que el esquema
+# quedara a cargo de Alembic (no tienen la tabla alembic_version)
+BASELINE_REVISION = "3c88b2347264"
+
+
+# Última revisión de las migraciones (head)
+def get_head_revision() -> str | None:
+    return ScriptDirectory.from_config(get_alembic_config()).get_current_head()
+
+
+# Revisión actual de la base de datos (None si no tiene la tabla alembic_version)
+async def get_database_revision(async_engine: AsyncEngine) -> str | None:
+    async with async_engine.connect() as connection:
+        has_table = await connection.run_sync(
+            lambda sync_connection: inspect(sync_connection).has_table("alembic_version")
+        )
+        if not has_table:
+            return None
+        result = await connection.execute(text("SELECT version_num FROM alembic_version"))
+        return result.scalar()
+
+
+# Aplicar las migraciones pendientes
+def upgrade_to_head():
+    command.upgrade(get_alembic_config(), "head")
+
+
+# Crear las tablas faltantes con create_all y marcar como head una base nueva. Una base con
+# tablas pero sin versión no se marca: create_all no agrega las columnas, índices ni datos de
+# las migraciones posteriores, así que debe migrarse desde BASELINE_REVISION
+def create_tables_and_stamp():
+    inspector = inspect(engine)
+    if inspector.has_table("alembic_version"):
+        create_db_and_tables()
+        return
+
+    if set(inspector.get_table_names()) & set(SQLModel.metadata.tables):
+        raise RuntimeError(
+            "The database has tables but no alembic_version table (it was created with "
+            "create_all), so it can't be stamped with the latest migration. Stamp it with the "
+            f"baseline revision (alembic stamp {BASELINE_REVISION}) and then upgrade it "
+            "(alembic upgrade head, or DB_INIT=migrate)"
+        )
+
+    create_db_and_tables()
+    command.stamp(get_alembic_config(), "head")
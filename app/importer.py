@@ -0,0 +1,89 @@
+############
+# Importer #
+############
+
+###################################################################################################
+# Usage
+#
+#   python -m app.importer data.ndjson [--format ndjson|csv] [--batch-size 1000]
+#
+# Imports a file of powers, characters and links (see app/crud/imports.py for the format)
+# without going through the API. The file is read one line at a time, and the rows are written
+# and committed in batches, printing the progress after every batch.
+###################################################################################################
+
+###################################################################################################
+# Imports
+import argparse
+import asyncio
+import time
+from typing import AsyncIterator, BinaryIO
+from app.db.database import async_session_maker, async_engine
+from app.crud.imports import ImportCrud, IMPORT_BATCH_SIZE, detect_format, read_records
+###################################################################################################
+
+
+###################################################################################################
+# Import
+async def file_chunks(file: BinaryIO, size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    chunk = file.read(size)
+    while chunk:
+        yield chunk
+        chunk = file.read(size)
+
+
+async def import_file(path: str, file_format: str, batch_size: int) -> bool:
+
+    """ Function to import a file and print the progress
+
+        :param str path: the file's path
+        :param str file_format: ndjson or csv
+        :param int batch_size: rows of each kind written per transaction
+        :return: True if every line was imported
+    """
+
+    start = time.perf_counter()
+    progress = None
+
+    with open(path, "rb") as file:
+        async with async_session_maker() as session:
+            async for progress in ImportCrud.import_records(
+                session=session,
+                records=read_records(file_chunks(file), file_format),
+                batch_size=batch_size
+            ):
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{progress.lines} lines ({progress.lines / elapsed:.0f}/s): "
+                    f"{progress.powers} powers, {progress.characters} characters, "
+                    f"{progress.links} links, {progress.skipped_links} skipped links, "
+                    f"{progress.errors} errors",
+                    flush=True
+                )
+
+    await async_engine.dispose()
+
+    for error in progress.error_samples:
+        print(f"error: {error}")
+
+    return progress.errors == 0
+###################################################################################################
+
+
+###################################################################################################
+# Main
+def main():
+    parser = argparse.ArgumentParser(description="Import powers, characters and links")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None)
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    file_format = args.format or detect_format(args.path)
+    ok = asyncio.run(import_file(args.path, file_format, args.batch_size))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
+###################################################################################################
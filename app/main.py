@@ -5,9 +5,13 @@
 ###################################################################################################
 # Imports
 from fastapi import FastAPI, status
-from app.db.database import create_db_and_tables
+from fastapi.responses import ORJSONResponse
 from app.models import characters, powers, character_power, users
-from app.routers import characters, powers, character_power, admin, login
+from app.routers import characters, powers, character_power, admin, login, metrics, health, export, imports
+from app.routers import battles, leaderboard
+from app.cache.leaderboard import leaderboard as leaderboard_ranking
+from app.db.database import async_session_maker
+from app.monitoring.middleware import PrometheusMiddleware
 ###################################################################################################
 
 
@@ -47,23 +51,47 @@ You can:
 * **Asign a power**: Link an existing power to a character.
 * **Read the powers**: View all powers associated with a specific character.
 * **Delete a power**: Detach a power from a character.
+
+### Battles
+
+You can:
+
+* **Simulate battles**: Score every hero against every villain, by the damage of their powers.
+
+### Leaderboard
+
+You can:
+
+* **Rank characters**: Get the heroes or villains with the most damage, or a character's rank.
 """
 
 app = FastAPI(
     title="Heroes and Villains API",
     summary="RESTful API built with FastAPI for managing heroes and villains",
     description=description,
-    contact={"name": "Aichino, Juan", "email": "aichinojuani@gmail.com"}
+    contact={"name": "Aichino, Juan", "email": "aichinojuani@gmail.com"},
+    # Serialize the responses with orjson
+    default_response_class=ORJSONResponse
 )
 
 ###################################################################################################
 
 
 ###################################################################################################
-# Models initialization
+# Middlewares
+app.add_middleware(PrometheusMiddleware)
+###################################################################################################
+
+
+###################################################################################################
+# Startup checks
 @app.on_event("startup")
 async def on_startup():
-    create_db_and_tables()
+    # The schema is managed by Alembic (or the launcher's DB_INIT), it isn't created here.
+    # The migration version check and the pool warm-up run in the background (see /readyz)
+    health.start_warm_up()
+    # The leaderboard is built from the database in the background (and rebuilt periodically)
+    leaderboard_ranking.start_refresh(async_session_maker)
 ###################################################################################################
 
 
@@ -74,6 +102,12 @@ app.include_router(powers.router)
 app.include_router(character_power.router)
 app.include_router(admin.router)
 app.include_router(login.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
+app.include_router(export.router)
+app.include_router(imports.router)
+app.include_router(battles.router)
+app.include_router(leaderboard.router)
 ###################################################################################################
 
 
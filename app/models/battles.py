@@ -0,0 +1,67 @@
+#########################################
+# Database, request and response models #
+#########################################
+
+
+###################################################################################################
+# Imports
+from typing import Annotated, Literal
+from sqlmodel import SQLModel, Field
+from app.crud.filters import MAX_ID
+###################################################################################################
+
+###################################################################################################
+# Models
+
+# Maximum number of IDs of each list (both lists are sent as query parameters)
+MAX_FIGHTER_IDS = 10_000
+
+# Request model of a simulation (all the heroes against all the villains by default)
+class BattleSimulationRequest(SQLModel):
+    hero_ids: list[Annotated[int, Field(ge=1, le=MAX_ID)]] | None = Field(
+        default=None, max_length=MAX_FIGHTER_IDS
+    )
+    villain_ids: list[Annotated[int, Field(ge=1, le=MAX_ID)]] | None = Field(
+        default=None, max_length=MAX_FIGHTER_IDS
+    )
+    # expected: win probabilities, monte_carlo: `trials` random duels per matchup
+    mode: Literal["expected", "monte_carlo"] = "expected"
+    trials: int = Field(default=1000, ge=1, le=1_000_000)
+    # Seed of the Monte Carlo mode (random if None)
+    seed: int | None = Field(default=None, ge=0)
+    # Heroes and villains returned in the rankings
+    top: int = Field(default=10, ge=1, le=100)
+    # Return every matchup (only for small simulations)
+    include_matchups: bool = False
+    model_config = {"extra": "forbid"}
+
+
+class BattleFighter(SQLModel):
+    character_id: int
+    name: str
+    total_damage: int
+    win_rate: float
+
+
+class BattleMatchup(SQLModel):
+    hero_id: int
+    villain_id: int
+    hero_win_rate: float
+
+
+# Response model of a simulation
+class BattleSimulationResult(SQLModel):
+    mode: str
+    trials: int | None = None
+    seed: int | None = None
+    heroes: int
+    villains: int
+    matchups_scored: int
+    # Mean win rate of the heroes over every matchup
+    hero_win_rate: float
+    top_heroes: list[BattleFighter]
+    top_villains: list[BattleFighter]
+    # Requested IDs that aren't characters of the expected type
+    missing_hero_ids: list[int] = []
+    missing_villain_ids: list[int] = []
+    matchups: list[BattleMatchup] | None = None
@@ -4,13 +4,19 @@
 
 # Imports
 ###################################################################################################
+from pydantic import computed_field
 from sqlmodel import SQLModel, Relationship, Field
+from sqlalchemy import Index
 ###################################################################################################
 
 
 ###################################################################################################
 # Models
 class CharacterPower(SQLModel, table=True):
+    # Lookups by power (the primary key leads with character_id)
+    __table_args__ = (
+        Index("ix_characterpower_power_id_character_id", "power_id", "character_id"),
+    )
 
     character_id: int = Field(
         default=None, primary_key=True, foreign_key="character.character_id"
@@ -20,6 +26,42 @@ class CharacterPower(SQLModel, table=True):
     )
 
 
+# Precomputed stats of the powers of each character (one row per character), kept up to date
+# by the CRUD methods that change the links or the damage of a power
+class CharacterPowerStats(SQLModel, table=True):
+    # Sort by total damage (keyset pagination)
+    __table_args__ = (
+        Index("ix_characterpowerstats_total_damage_character_id", "total_damage", "character_id"),
+    )
+
+    character_id: int = Field(
+        primary_key=True, foreign_key="character.character_id", ondelete="CASCADE"
+    )
+    power_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    total_damage: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    max_damage: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+
+
+# Response model of the stats
+class CharacterPowerStatsPublic(SQLModel):
+    power_count: int = 0
+    total_damage: int = 0
+    max_damage: int = 0
+
+    @computed_field
+    @property
+    def avg_damage(self) -> float:
+        return round(self.total_damage / self.power_count, 2) if self.power_count else 0.0
+
+
+# Response model for the bulk assignment of powers
+class CharacterPowersAssignResult(SQLModel):
+    character_id: int
+    assigned: list[int]
+    already_present: list[int]
+    missing: list[int]
+
+
 
 
 
@@ -3,14 +3,26 @@
 #########################################
 
 # Imports
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Annotated
+from pydantic import field_validator
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, DDL, event, text
 from enum import Enum
-from app.models.character_power import CharacterPower
+from app.models.character_power import (
+    CharacterPower, CharacterPowerStats, CharacterPowerStatsPublic
+)
+from app.models.powers import PowerPublic
+from app.crud.filters import MAX_BATCH_IDS, MAX_ID
 if TYPE_CHECKING:
     from app.models.powers import Powers
 
 
+# Search document of a character (GIN indexed, used by GET /characters/search)
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(secret_name, ''))"
+)
+
+
 # Models
 class CharacterType(Enum):
     hero="Hero"
@@ -25,11 +37,48 @@ class CharacterBase(SQLModel):
 
 # Database Model
 class Character(CharacterBase, table=True):
+    # Composite index for the heroes/villains listing (filter by type, order by id)
+    __table_args__ = (
+        Index("ix_character_character_type_character_id", "character_type", "character_id"),
+        # Age range filter
+        Index("ix_character_age", "age"),
+        # Search indexes (PostgreSQL only): trigrams for substring and typo tolerant matches,
+        # and the words of the name and secret name for prefix matches
+        Index(
+            "ix_character_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_character_secret_name_trgm", "secret_name",
+            postgresql_using="gin", postgresql_ops={"secret_name": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_character_search_document", text(SEARCH_DOCUMENT), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
     character_id: int | None = Field(default=None, primary_key=True)
+    # Row version, incremented on every update (used to build the ETags)
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
 
     powers: list['Powers'] = Relationship(
         back_populates="characters", link_model=CharacterPower)
 
+    # Stats of the powers (joined to every query of characters, deleted with the character)
+    stats: CharacterPowerStats | None = Relationship(
+        sa_relationship_kwargs={
+            "uselist": False, "lazy": "joined", "cascade": "all, delete-orphan"
+        }
+    )
+
+
+# The trigram indexes need the pg_trgm extension (created by the migrations, or here by create_all)
+event.listen(
+    SQLModel.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
 
 # Request model (forbid extra params)
 class CharacterCreate(CharacterBase):
@@ -46,4 +95,50 @@ class CharacterUpdate(SQLModel):
 
 # Response model
 class CharacterPublic(CharacterBase):
-    character_id: int
\ No newline at end of file
+    character_id: int
+    version: int
+    stats: CharacterPowerStatsPublic = CharacterPowerStatsPublic()
+
+    # Characters without a stats row have no powers
+    @field_validator("stats", mode="before")
+    @classmethod
+    def empty_stats(cls, stats):
+        return CharacterPowerStatsPublic() if stats is None else stats
+
+
+# Search response model (higher rank, better match)
+class CharacterSearchResult(CharacterPublic):
+    rank: float
+
+
+# Response model with the character's powers
+class CharacterPublicWithPowers(CharacterPublic):
+    powers: list[PowerPublic] = []
+
+
+# Bulk create response models
+class CharacterBulkItem(SQLModel):
+    index: int
+    status: str
+    character: CharacterPublic
+
+
+class CharacterBulkResult(SQLModel):
+    created: int
+    results: list[CharacterBulkItem]
+
+
+# Batch fetch request and response models
+class CharacterBatchGet(SQLModel):
+    # Up to MAX_BATCH_IDS IDs, each one a positive 32-bit integer
+    ids: list[Annotated[int, Field(ge=1, le=MAX_ID)]] = Field(
+        min_length=1, max_length=MAX_BATCH_IDS
+    )
+    model_config = {"extra": "forbid"}
+
+
+class CharacterBatchResult(SQLModel):
+    # The characters found, in the order of the IDs
+    characters: list[CharacterPublic]
+    # The IDs not found
+    missing: list[int]
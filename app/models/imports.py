@@ -0,0 +1,27 @@
+#########################################
+# Database, request and response models #
+#########################################
+
+
+###################################################################################################
+# Imports
+from sqlmodel import SQLModel
+###################################################################################################
+
+###################################################################################################
+# Models
+
+# Progress of an import, reported after every batch
+class ImportProgress(SQLModel):
+    # Lines read from the file
+    lines: int = 0
+    # Rows inserted or changed (the unchanged ones aren't written)
+    characters: int = 0
+    powers: int = 0
+    links: int = 0
+    # Links already present or pointing to a missing character or power
+    skipped_links: int = 0
+    # Invalid lines (or rows of a failed batch) and the first error messages
+    errors: int = 0
+    error_samples: list[str] = []
+    done: bool = False
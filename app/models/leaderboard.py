@@ -0,0 +1,34 @@
+#########################################
+# Database, request and response models #
+#########################################
+
+
+###################################################################################################
+# Imports
+from sqlmodel import SQLModel
+###################################################################################################
+
+###################################################################################################
+# Models
+
+# A ranked character (rank 1 has the highest total damage)
+class LeaderboardEntry(SQLModel):
+    rank: int
+    character_id: int
+    name: str
+    total_damage: int
+
+
+# Rank of one character in the ranking of their type
+class LeaderboardRank(LeaderboardEntry):
+    character_type: str
+    # Characters in the ranking of their type
+    ranked: int
+
+
+# A page of the ranking of heroes or villains
+class LeaderboardPage(SQLModel):
+    character_type: str
+    # Characters in the ranking
+    ranked: int
+    entries: list[LeaderboardEntry]
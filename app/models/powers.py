@@ -7,6 +7,7 @@
 # Imports
 from typing import TYPE_CHECKING
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from app.models.character_power import CharacterPower
 if TYPE_CHECKING:
     from app.models.characters import Character
@@ -22,7 +23,19 @@ class PowersBase(SQLModel):
 
 # Database model
 class Powers(PowersBase, table=True):
+    __table_args__ = (
+        # Damage range filter and sort by damage (with keyset pagination)
+        Index("ix_powers_power_damage_power_id", "power_damage", "power_id"),
+        # Name prefix filter (PostgreSQL only, trigrams)
+        Index(
+            "ix_powers_power_name_trgm", "power_name",
+            postgresql_using="gin", postgresql_ops={"power_name": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
     power_id: int | None = Field(default=None, primary_key=True)
+    # Row version, incremented on every update (used to build the ETags)
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
 
     characters: list['Character'] = Relationship(
         back_populates="powers", link_model=CharacterPower)
@@ -35,6 +48,26 @@ class PowerCreate(PowersBase):
 # Response model
 class PowerPublic(PowersBase):
     power_id: int
+    version: int
+
+
+# Response model with the number of characters that hold the power
+class PowerPublicWithCount(PowerPublic):
+    character_count: int
+
+
+# Bulk create response models
+class PowerBulkItem(SQLModel):
+    index: int
+    status: str
+    power: PowerPublic | None = None
+    detail: str | None = None
+
+
+class PowerBulkResult(SQLModel):
+    created: int
+    conflicts: int
+    results: list[PowerBulkItem]
 
 
 # Update model
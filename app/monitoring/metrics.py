@@ -0,0 +1,128 @@
+###########
+# Metrics #
+###########
+
+###################################################################################################
+# Imports
+from prometheus_client import Counter, Gauge, Histogram
+###################################################################################################
+
+
+###################################################################################################
+# Password hashing pool
+
+# Time a hashing job waits in the queue before a worker picks it up
+HASH_POOL_WAIT_SECONDS = Histogram(
+    "hash_pool_wait_seconds",
+    "Time spent waiting for a free hashing worker",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+# Time spent running bcrypt (hash or verify)
+HASH_DURATION_SECONDS = Histogram(
+    "hash_duration_seconds",
+    "Time spent hashing or verifying a password",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.5)
+)
+
+# Jobs rejected because the hashing queue was full
+HASH_POOL_REJECTED_TOTAL = Counter(
+    "hash_pool_rejected_total",
+    "Hashing jobs rejected because the queue was full",
+    ["operation"]
+)
+###################################################################################################
+
+
+###################################################################################################
+# Response cache
+CACHE_HITS_TOTAL = Counter(
+    "cache_hits_total",
+    "Cache lookups that found an entry",
+    ["namespace"]
+)
+
+CACHE_MISSES_TOTAL = Counter(
+    "cache_misses_total",
+    "Cache lookups that didn't find an entry",
+    ["namespace"]
+)
+
+CACHE_EVICTIONS_TOTAL = Counter(
+    "cache_evictions_total",
+    "Entries removed from the cache because of capacity or expiration",
+    ["backend", "reason"]
+)
+###################################################################################################
+
+
+###################################################################################################
+# Database connection pool
+DB_POOL_CHECKOUT_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting to get a connection from the pool",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+)
+
+# Updated by the pool's checkout/checkin events, summed over the live workers
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Connections currently checked out from the pools of every worker",
+    ["engine"],
+    multiprocess_mode="livesum"
+)
+
+DB_POOL_CONFIGURED_SIZE = Gauge(
+    "db_pool_size",
+    "Configured size of the connection pool of each worker",
+    ["engine"],
+    multiprocess_mode="livemax"
+)
+###################################################################################################
+
+
+###################################################################################################
+# HTTP requests (per route template)
+HTTP_REQUESTS_TOTAL = Counter(
+    "http_requests_total",
+    "Requests handled",
+    ["method", "route", "status"]
+)
+
+HTTP_REQUEST_DURATION_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests currently being handled by every worker",
+    ["method", "route"],
+    multiprocess_mode="livesum"
+)
+
+HTTP_RESPONSE_SIZE_BYTES = Histogram(
+    "http_response_size_bytes",
+    "Size of the response bodies",
+    ["method", "route"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed by each request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+
+DB_QUERY_SECONDS_PER_REQUEST = Histogram(
+    "db_query_seconds_per_request",
+    "Time spent running SQL statements in each request",
+    ["method", "route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+###################################################################################################
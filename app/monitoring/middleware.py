@@ -0,0 +1,99 @@
+######################
+# Metrics middleware #
+######################
+
+###################################################################################################
+# Imports
+import time
+from starlette.routing import Match
+from app.monitoring.queries import QueryStats, current_query_stats, check_query_stats, QUERY_DEBUG
+from app.monitoring.metrics import (
+    HTTP_REQUESTS_TOTAL, HTTP_REQUEST_DURATION_SECONDS, HTTP_REQUESTS_IN_PROGRESS,
+    HTTP_RESPONSE_SIZE_BYTES, DB_QUERIES_PER_REQUEST, DB_QUERY_SECONDS_PER_REQUEST
+)
+###################################################################################################
+
+
+###################################################################################################
+# Route matching
+def match_route_path(scope) -> str:
+
+    """ Function to return the template of the route a request will be routed to, before the
+        router sets it in the scope (the same matching as the router: the first full match,
+        or the first partial one, e.g. a known path with another method)
+
+        :param scope: the request's ASGI scope
+        :return: the route template, or "unmatched"
+    """
+
+    partial = None
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+        if match == Match.PARTIAL and partial is None:
+            partial = route
+
+    return getattr(partial, "path", "unmatched")
+###################################################################################################
+
+
+###################################################################################################
+# Middleware
+class PrometheusMiddleware:
+
+    """ ASGI middleware that records, per route template (e.g. /characters/{character_id}),
+        the requests in progress and the request count, latency, response size and the
+        database queries of each request.
+        In debug mode (QUERY_DEBUG) it also checks the query budgets.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(
+            method=method, route=match_route_path(scope)
+        )
+        in_progress.inc()
+        start = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            current_query_stats.reset(token)
+
+            # The route is added to the scope by the router (unmatched paths share one label)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+
+            HTTP_REQUESTS_TOTAL.labels(method=method, route=path, status=status_code).inc()
+            HTTP_REQUEST_DURATION_SECONDS.labels(method=method, route=path).observe(duration)
+            HTTP_RESPONSE_SIZE_BYTES.labels(method=method, route=path).observe(response_size)
+            DB_QUERIES_PER_REQUEST.labels(method=method, route=path).observe(stats.count)
+            DB_QUERY_SECONDS_PER_REQUEST.labels(method=method, route=path).observe(stats.duration)
+
+        # Debug mode: report N+1 patterns and check the route's query budget
+        if QUERY_DEBUG:
+            check_query_stats(method, scope.get("route"), stats)
+###################################################################################################
@@ -0,0 +1,130 @@
+############################
+# Per-request SQL tracking #
+############################
+
+###################################################################################################
+# Imports
+import os
+import time
+import logging
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+###################################################################################################
+
+
+###################################################################################################
+# Configuration
+
+# Debug / profiling mode: keep every statement of the request and check the query budgets
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "false").lower() in ("1", "true", "yes")
+# Raise QueryBudgetExceeded when a route exceeds its budget (use it in the test suite)
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() in ("1", "true", "yes")
+# Executions of the same statement with different parameters reported as a possible N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 3))
+
+logger = logging.getLogger("app.queries")
+###################################################################################################
+
+
+###################################################################################################
+# Per-request statistics
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0
+    # Parameters of each execution by statement (only filled in debug mode)
+    statements: dict[str, list[str]] = field(default_factory=dict)
+
+
+# Statistics of the request being handled (None outside a request)
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+###################################################################################################
+
+
+###################################################################################################
+# Engine events
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += time.perf_counter() - start
+        if QUERY_DEBUG:
+            stats.statements.setdefault(statement, []).append(repr(parameters))
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+def instrument_engine(engine: Engine):
+
+    """ Function to count the statements and the time spent in the database for each request
+
+        :param Engine engine: a sync engine (use async_engine.sync_engine for async engines)
+    """
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+###################################################################################################
+
+
+###################################################################################################
+# Query budgets
+class QueryBudgetExceeded(Exception):
+    """ Raised in strict mode when a request runs more statements than its route's budget """
+
+
+def query_budget(max_queries: int):
+
+    """ Decorator to declare the maximum number of SQL statements an endpoint may run.
+        Place it below the router decorator.
+
+        :param int max_queries: the maximum number of statements per request
+    """
+
+    def decorator(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+def check_query_stats(method: str, route, stats: QueryStats):
+
+    """ Function to log the possible N+1 patterns of a request and check its query budget
+
+        :param str method: the request's method
+        :param route: the matched route (None if the path didn't match any route)
+        :param QueryStats stats: the request's statistics
+        :raises QueryBudgetExceeded: in strict mode, if the budget is exceeded
+    """
+
+    path = getattr(route, "path", "unmatched")
+
+    # Same statement executed many times with different parameters (N+1 pattern)
+    for statement, parameters in stats.statements.items():
+        distinct = len(set(parameters))
+        if distinct >= N_PLUS_ONE_THRESHOLD:
+            logger.warning(
+                "Possible N+1 in %s %s: statement executed %d times with different "
+                "parameters: %s", method, path, distinct, statement
+            )
+
+    # Declared budget of the endpoint
+    budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+    if budget is not None and stats.count > budget:
+        message = f"{method} {path} ran {stats.count} SQL statements (budget: {budget})"
+        logger.warning(message)
+        if QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+###################################################################################################
@@ -7,11 +7,13 @@
 # Imports
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlmodel import Session
-from app.db.database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_async_session
 from app.models.users import User, UserIn, UserOut
 from app.crud.users import UserCrud
 from app.auth.auth import get_current_user
+from app.monitoring.queries import query_budget
+from app.auth.hashing import HashingPoolFull
 ####################################################################################################
 
 
@@ -27,7 +29,7 @@ router = APIRouter(
 
 ###################################################################################################
 # Session dependency
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 ###################################################################################################
 
 
@@ -53,9 +55,19 @@ SessionDep = Annotated[Session, Depends(get_session)]
                     }
                 }
             }
+        },
+        status.HTTP_429_TOO_MANY_REQUESTS: {
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Too many requests, try again later"
+                    }
+                }
+            }
         }
     }
 )
+@query_budget(2)
 async def create_user(
     session: SessionDep,
     user: Annotated[UserIn, Body(example={
@@ -71,8 +83,15 @@ async def create_user(
         - **password**: a string password
     """
 
-    # Create the user
-    new_user = UserCrud.create_user(session=session, user=user)
+    # Create the user (raise 429 if the hashing pool is full)
+    try:
+        new_user = await UserCrud.create_user(session=session, user=user)
+    except HashingPoolFull:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, try again later",
+            headers={"Retry-After": "1"}
+        )
 
     # Raise Exception if the username already exists
     if new_user is None:
@@ -0,0 +1,215 @@
+##############################
+#   API Router for battles   #
+##############################
+
+###################################################################################################
+# Imports
+import secrets
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_async_session
+from app.crud.battles import BattleCrud
+from app.crud.characters import CharacterCrud
+from app.battles.simulation import simulate, top
+from app.models.battles import (
+    BattleSimulationRequest, BattleSimulationResult, BattleFighter, BattleMatchup
+)
+from app.auth.auth import get_current_user
+from app.monitoring.queries import query_budget
+###################################################################################################
+
+
+###################################################################################################
+# Router configuration
+router = APIRouter(
+    prefix="/battles",
+    tags=["Battles"]
+)
+
+# Maximum number of matchups returned with include_matchups
+MAX_MATCHUPS = 10_000
+###################################################################################################
+
+
+###################################################################################################
+# Session dependency
+SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+###################################################################################################
+
+
+###################################################################################################
+# Helpers
+
+# Requested IDs that weren't loaded (missing or of the other type)
+def missing_ids(requested: list[int] | None, loaded) -> list[int]:
+    if requested is None:
+        return []
+
+    loaded = set(loaded.tolist())
+    return [
+        character_id for character_id in dict.fromkeys(requested) if character_id not in loaded
+    ]
+###################################################################################################
+
+
+###################################################################################################
+# Endpoints
+###################################################################################################
+
+###################################################################################################
+# Endpoint to simulate battles between heroes and villains
+@router.post(
+    "/simulate",
+    dependencies=[Depends(get_current_user)],
+    response_model=BattleSimulationResult,
+    summary="Simulate battles between heroes and villains",
+    responses={
+        status.HTTP_200_OK: {
+            "content": {
+                "application/json": {
+                    "example": {
+                        "mode": "monte_carlo",
+                        "trials": 1000,
+                        "seed": 42,
+                        "heroes": 2,
+                        "villains": 1,
+                        "matchups_scored": 2,
+                        "hero_win_rate": 0.52,
+                        "top_heroes": [
+                            {
+                                "character_id": 1,
+                                "name": "Spider-Man",
+                                "total_damage": 800,
+                                "win_rate": 0.815
+                            }
+                        ],
+                        "top_villains": [
+                            {
+                                "character_id": 2,
+                                "name": "Venom",
+                                "total_damage": 500,
+                                "win_rate": 0.48
+                            }
+                        ],
+                        "missing_hero_ids": [],
+                        "missing_villain_ids": [],
+                        "matchups": None
+                    }
+                }
+            }
+        },
+        status.HTTP_422_UNPROCESSABLE_ENTITY: {
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Too many matchups to return (max 10000)"
+                    }
+                }
+            }
+        }
+    }
+)
+@query_budget(2)
+async def simulate_battles(
+    session: SessionDep,
+    simulation: BattleSimulationRequest
+) -> BattleSimulationResult:
+
+    """ Function to score every hero against every villain. A character's strength is the
+        total damage of their powers; in each duel both sides deal a random share of it and
+        the one dealing more wins. The strengths are loaded once into NumPy arrays and the
+        N x M matchups are scored at once (outside the event loop).
+
+        - **hero_ids**, **villain_ids** (opt): the characters to simulate, up to 10000 IDs
+        each (default: all the heroes and all the villains)
+        - **mode** (opt): expected (win probabilities, default) or monte_carlo (random duels)
+        - **trials** (opt): duels per matchup in monte_carlo mode
+        - **seed** (opt): seed of the monte_carlo mode, to repeat a simulation (a random one is
+        used and returned if missing)
+        - **top** (opt): heroes and villains returned in the rankings, best win rate first
+        - **include_matchups** (opt): return the hero win rate of every matchup (at most 10000)
+    """
+
+    # Load the strengths of the heroes and villains
+    fighters = await BattleCrud.load_fighters(
+        session=session, hero_ids=simulation.hero_ids, villain_ids=simulation.villain_ids
+    )
+    hero_ids, hero_strength = fighters["hero"]
+    villain_ids, villain_strength = fighters["villain"]
+
+    if simulation.include_matchups and len(hero_ids) * len(villain_ids) > MAX_MATCHUPS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Too many matchups to return (max {MAX_MATCHUPS})"
+        )
+
+    monte_carlo = simulation.mode == "monte_carlo"
+    seed = None
+    if monte_carlo:
+        seed = simulation.seed if simulation.seed is not None else secrets.randbits(32)
+
+    # Release the connection while the matchups are scored (the names are read with a new one)
+    await session.close()
+
+    # Score the matchups in a worker thread (NumPy releases the GIL)
+    result = await run_in_threadpool(
+        simulate,
+        hero_strength,
+        villain_strength,
+        trials=simulation.trials if monte_carlo else None,
+        seed=seed,
+        keep_matchups=simulation.include_matchups
+    )
+
+    # Build the rankings
+    best_heroes = top(result.hero_win_rates, simulation.top)
+    best_villains = top(result.villain_win_rates, simulation.top)
+    names = await CharacterCrud.read_names(
+        session=session,
+        character_ids=hero_ids[best_heroes].tolist() + villain_ids[best_villains].tolist()
+    )
+
+    def ranking(ids, strength, win_rates, positions) -> list[BattleFighter]:
+        return [
+            BattleFighter(
+                character_id=int(ids[position]),
+                name=names.get(int(ids[position]), ""),
+                total_damage=int(strength[position]),
+                win_rate=round(float(win_rates[position]), 4)
+            )
+            for position in positions
+        ]
+
+    matchups = None
+    if result.matchups is not None:
+        matchups = [
+            BattleMatchup(
+                hero_id=int(hero_ids[row]),
+                villain_id=int(villain_ids[column]),
+                hero_win_rate=round(float(result.matchups[row, column]), 4)
+            )
+            for row in range(len(hero_ids)) for column in range(len(villain_ids))
+        ]
+
+    return BattleSimulationResult(
+        mode=simulation.mode,
+        trials=simulation.trials if monte_carlo else None,
+        seed=seed,
+        heroes=len(hero_ids),
+        villains=len(villain_ids),
+        matchups_scored=len(hero_ids) * len(villain_ids),
+        hero_win_rate=(
+            round(float(result.hero_win_rates.mean()), 4)
+            if len(hero_ids) and len(villain_ids) else 0.0
+        ),
+        top_heroes=ranking(hero_ids, hero_strength, result.hero_win_rates, best_heroes),
+        top_villains=ranking(
+            villain_ids, villain_strength, result.villain_win_rates, best_villains
+        ),
+        missing_hero_ids=missing_ids(simulation.hero_ids, hero_ids),
+        missing_villain_ids=missing_ids(simulation.villain_ids, villain_ids),
+        matchups=matchups
+    )
+###################################################################################################
@@ -5,15 +5,19 @@
 ###################################################################################################
 # Imports
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
-from sqlmodel import Session
-from app.db.database import get_session
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Request, Response, Path
+from fastapi.responses import ORJSONResponse
+from pydantic import Field
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_async_session
 from app.crud.character_power import CharacterPowerCrud
-from app.models.powers import PowerPublic, Powers
-from app.models.characters import Character
+from app.models.powers import PowerPublic
+from app.models.character_power import CharacterPowersAssignResult
 from app.auth.auth import get_current_user
+from app.monitoring.queries import query_budget
+from app.crud.filters import MAX_ID
+from app.cache.cache import cache, character_powers_key
+from app.cache.etag import content_etag, not_modified
 ###################################################################################################
 
 
@@ -28,7 +32,10 @@ router = APIRouter(
 
 ###################################################################################################
 # Session dependency
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+
+# ID path parameters (the ID columns are 32-bit integers: larger IDs are rejected with a 422)
+IdPath = Annotated[int, Path(ge=1, le=MAX_ID)]
 ###################################################################################################
 
 
@@ -76,11 +83,13 @@ SessionDep = Annotated[Session, Depends(get_session)]
         }
     }
 )
+# Character, power, link and stats
+@query_budget(4)
 async def assing_power(
     session: SessionDep,
-    character_id: int,
-    power_id: int
-) -> JSONResponse:
+    character_id: IdPath,
+    power_id: IdPath
+) -> ORJSONResponse:
     
     """ Function to assign a power to a character by passing the character_id
         and power_id
@@ -90,7 +99,7 @@ async def assing_power(
     """
 
     # Assign the power
-    power_assigned = CharacterPowerCrud.assign_power_to_character(
+    power_assigned = await CharacterPowerCrud.assign_power_to_character(
         session=session,
         character_id=character_id,
         power_id=power_id
@@ -109,9 +118,78 @@ async def assing_power(
             detail="Character or power not found!"
         )
     
-    return JSONResponse(content={
+    return ORJSONResponse(content={
         "message":"Power successfully assigned to the character!"
     })
+
+
+# Endpoint to assign many powers to a character
+@router.post(
+    "",
+    dependencies=[Depends(get_current_user)],
+    response_model=CharacterPowersAssignResult,
+    summary="Assign many powers to a character",
+    responses={
+        status.HTTP_200_OK: {
+            "content": {
+                "application/json":{
+                    "example":{
+                        "character_id": 11,
+                        "assigned": [7, 8],
+                        "already_present": [3],
+                        "missing": [99]
+                    }
+                }
+            }
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "description": "Not Found",
+            "content":{
+                "application/json":{
+                    "example":{
+                        "detail":"Character not found!"
+                    }
+                }
+            }
+        }
+    }
+)
+# Character, powers, links and stats
+@query_budget(4)
+async def assign_powers(
+    session: SessionDep,
+    character_id: IdPath,
+    power_ids: Annotated[
+        list[Annotated[int, Field(ge=1, le=MAX_ID)]],
+        Body(max_length=1000, example=[3, 7, 8, 99])
+    ]
+) -> CharacterPowersAssignResult:
+
+    """ Function to assign many powers to a character by passing the character_id
+        and a JSON list with the powers' ids.
+
+        - **character_id**: the character's id
+        - **power_ids**: list of the powers' ids to be assigned to the character
+
+        The response tells which powers were assigned, which were already present
+        and which don't exist.
+    """
+
+    # Assign the powers
+    result = await CharacterPowerCrud.assign_powers_to_character(
+        session=session,
+        character_id=character_id,
+        power_ids=power_ids
+    )
+
+    # Raise 404 if the character doesn't exist
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found!"
+        )
+
+    return result
 ###################################################################################################
 
 
@@ -133,7 +211,8 @@ async def assing_power(
                             {
                                 "power_damage": 320,
                                 "power_id": 7,
-                                "power_name": "Web Shooting"
+                                "power_name": "Web Shooting",
+                                "version": 1
                             }
                         ]
                     }
@@ -152,10 +231,12 @@ async def assing_power(
         }
     }
 )
+@query_budget(1)
 async def read_characters_powers(
     session: SessionDep,
-    character_id: int
-) -> JSONResponse:
+    request: Request,
+    character_id: IdPath
+) -> ORJSONResponse:
     
     """ Function to return the list of powers of a character by passing
         the character's ID.
@@ -163,32 +244,43 @@ async def read_characters_powers(
         - **character_id**: the character's ID
     """
 
-    # Get the powers
-    powers = CharacterPowerCrud.read_characters_powers(
-        session=session,
-        character_id=character_id
-    )
+    # Get the cached response if there is one
+    content = await cache.get_json(character_powers_key(character_id))
 
-    # Raise 404 if powers returns None (couldn't find the character)
-    if powers is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Character not found!"
+    if content is None:
+        # Get the character with their powers
+        character = await CharacterPowerCrud.read_characters_powers(
+            session=session,
+            character_id=character_id
         )
+
+        # Raise 404 if character is None (couldn't find the character)
+        if character is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Character not found!"
+            )
     
-    # Get the character
-    character = session.get(Character, character_id)
-    
-    # Return the powers
-    return JSONResponse(
-        content={
+        # Cache the powers
+        content = {
             "character": {
                 "character_id": character.character_id,
                 "character_name": character.name
             },
-            "powers": jsonable_encoder(powers)
+            "powers": [
+                PowerPublic.model_validate(power).model_dump(mode="json")
+                for power in character.powers
+            ]
         }
-    )
+        await cache.set_json(character_powers_key(character_id), content)
+
+    # Return 304 if the client already has this version of the powers, else return them
+    response = ORJSONResponse(content=content)
+    not_modified_response = not_modified(request, response, content_etag(content))
+    if not_modified_response:
+        return not_modified_response
+
+    return response
 ###################################################################################################
 
 
@@ -209,7 +301,8 @@ async def read_characters_powers(
                         "deleted_power": {
                             "power_name": "Super Strenght",
                             "power_damage": 400,
-                            "power_id": 6
+                            "power_id": 6,
+                            "version": 1
                         },
                         "deleted_from": {
                             "character_name": "Captain America",
@@ -229,11 +322,13 @@ async def read_characters_powers(
         }
     }
 )
+# Link (with the character and the power), link delete and stats
+@query_budget(3)
 async def delete_character_power(
     session: SessionDep,
-    character_id: int,
-    power_id: int
-) -> JSONResponse:
+    character_id: IdPath,
+    power_id: IdPath
+) -> ORJSONResponse:
     
     """ Function to delete a power from a character by passing the character's ID and
         the power's ID.
@@ -243,36 +338,25 @@ async def delete_character_power(
     """
 
     # Remove the power from the character
-    remove_power = CharacterPowerCrud.delete_character_power(
+    removed = await CharacterPowerCrud.delete_character_power(
         session=session,
         character_id=character_id,
         power_id=power_id
     )
 
-    # Raise a 404 if remove_power is False (couldn't get the character or power)
-    if remove_power is False:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Couldn't get the character or the power"
-        )
-    
-    # Get the deleted power
-    deleted_power = session.get(Powers, power_id)
-    # Get the character
-    character = session.get(Character, character_id)
-
-    # Verify if the power or character exists
-    if not deleted_power or not character:
+    # Raise a 404 if removed is None (couldn't get the character or power)
+    if removed is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Couldn't get the character or the power"
         )
+    character, deleted_power = removed
 
     # Response
-    response = JSONResponse(
+    response = ORJSONResponse(
         content={
             "message": "Power successfully removed from the character!",
-            "deleted_power": jsonable_encoder(deleted_power),
+            "deleted_power": PowerPublic.model_validate(deleted_power).model_dump(mode="json"),
             "deleted_from": {
                 "character_name": character.name,
                 "character_id": character_id
@@ -5,15 +5,22 @@
 
 ###################################################################################################
 # Imports
-from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status, Body, Query
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
-from sqlmodel import Session
-from app.db.database import get_session
-from app.models.characters import CharacterCreate, CharacterPublic, CharacterUpdate, Character
+from typing import Annotated, Literal
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Request, Response, Path
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_async_session
+from app.models.characters import (
+    CharacterCreate, CharacterPublic, CharacterUpdate, Character, CharacterPublicWithPowers,
+    CharacterBulkResult, CharacterSearchResult, CharacterBatchGet, CharacterBatchResult
+)
 from app.crud.characters import CharacterCrud
+from app.crud.pagination import encode_cursor, get_cursor_id, get_sort_cursor
+from app.crud.filters import parse_id_list, MAX_BATCH_IDS, MAX_ID
+from app.cache.cache import cache, character_key
+from app.cache.etag import content_etag, not_modified
 from app.auth.auth import get_current_user
+from app.monitoring.queries import query_budget
 ####################################################################################################
 
 
@@ -28,7 +35,34 @@ router = APIRouter(
 
 ###################################################################################################
 # Session dependency
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+
+# ID path parameters (the ID columns are 32-bit integers: larger IDs are rejected with a 422)
+IdPath = Annotated[int, Path(ge=1, le=MAX_ID)]
+###################################################################################################
+
+
+###################################################################################################
+# Keyset pagination helpers
+
+# Types of the sort values kept in the cursors
+SORT_VALUE_TYPES = {"name": str, "total_damage": int}
+
+
+# Add the X-Next-Cursor header when the page is full (there may be more characters)
+def set_next_cursor(
+    response: Response, characters: list[Character], limit: int, sort: str = "id"
+):
+    if characters and len(characters) == limit:
+        last = characters[-1]
+        if sort == "id":
+            response.headers["X-Next-Cursor"] = encode_cursor(last.character_id)
+        else:
+            # The stats are sorted through the character's stats row
+            row = last.stats if sort.lstrip("-") == "total_damage" else last
+            response.headers["X-Next-Cursor"] = encode_cursor(
+                last.character_id, sort, getattr(row, sort.lstrip("-"))
+            )
 ###################################################################################################
 
 
@@ -54,13 +88,15 @@ SessionDep = Annotated[Session, Depends(get_session)]
                             "secret_name":"Steve",
                             "age": 100,
                             "character_type": "Hero",
-                            "character_id": 3
+                            "character_id": 3,
+                            "version": 1
                         }
                     }
                 }
             }
         }
 )
+@query_budget(3)
 async def create_character(
     session: SessionDep,
     character: Annotated[
@@ -85,18 +121,136 @@ async def create_character(
     db_character = Character.model_validate(character)
 
     # Create and return the character
-    db_character = CharacterCrud.create_character(session=session, character=db_character)
+    db_character = await CharacterCrud.create_character(session=session, character=db_character)
     return db_character
+
+
+# Endpoint to create many characters at once
+@router.post(
+        "/bulk",
+        dependencies=[Depends(get_current_user)],
+        response_model=CharacterBulkResult,
+        summary="Create many characters",
+        status_code=status.HTTP_201_CREATED,
+        responses={
+            status.HTTP_201_CREATED:{
+                "description":"Created",
+                "content":{
+                    "application/json":{
+                        "example":{
+                            "created": 1,
+                            "results": [{
+                                "index": 0,
+                                "status": "created",
+                                "character": {
+                                    "name": "Captain America",
+                                    "secret_name":"Steve Rogers",
+                                    "age": 105,
+                                    "character_type": "Hero",
+                                    "character_id": 3,
+                                    "version": 1
+                                }
+                            }]
+                        }
+                    }
+                }
+            }
+        }
+)
+async def create_characters(
+    session: SessionDep,
+    characters: Annotated[
+        list[CharacterCreate],
+        Body(max_length=10000, example=[{
+            "name":"Captain America",
+            "secret_name": "Steve Rogers",
+            "age": 105,
+            "character_type": "Hero"
+        }])
+    ]
+):
+    """ Function to create many characters in a single transaction by passing a JSON list
+        (up to 10000 items) with the same fields as the single create endpoint.
+    """
+    # Model validation for each CharacterCreate
+    db_characters = [Character.model_validate(character) for character in characters]
+
+    # Create the characters
+    created = await CharacterCrud.create_characters(session=session, characters=db_characters)
+
+    # Return the result of each character
+    return CharacterBulkResult(
+        created=len(created),
+        results=[
+            {"index": index, "status": "created", "character": character}
+            for index, character in enumerate(created)
+        ]
+    )
 ###################################################################################################
 
 
 ###################################################################################################
 # Endpoints to read characters
 
+# Get many characters by their IDs
+@router.post(
+        "/batch-get",
+        response_model=CharacterBatchResult,
+        summary="Get many characters by their IDs",
+        responses={
+            status.HTTP_200_OK: {
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "characters": [{
+                                "name": "Captain America",
+                                "secret_name": "Steve Rogers",
+                                "age": 105,
+                                "character_type": "Hero",
+                                "character_id": 3,
+                                "version": 1,
+                                "stats": {
+                                    "power_count": 2,
+                                    "total_damage": 450,
+                                    "max_damage": 300,
+                                    "avg_damage": 225.0
+                                }
+                            }],
+                            "missing": [99]
+                        }
+                    }
+                }
+            }
+        }
+)
+@query_budget(1)
+async def batch_get_characters(
+    session: SessionDep,
+    batch: CharacterBatchGet
+) -> CharacterBatchResult:
+    """
+        Function to return many characters with one query (e.g. the IDs of a team), instead
+        of one request per ID. The characters are returned in the order of the IDs, and the
+        IDs not found in missing.
+
+        - **ids**: the characters' IDs (up to 100, the repeated ones are returned once)
+    """
+    character_ids = list(dict.fromkeys(batch.ids))
+    characters = await CharacterCrud.read_characters(
+        session=session, character_ids=character_ids
+    )
+
+    found = {character.character_id for character in characters}
+    return CharacterBatchResult(
+        characters=[CharacterPublic.model_validate(character) for character in characters],
+        missing=[character_id for character_id in character_ids if character_id not in found]
+    )
+
+
 # Get all the characters (with offset and limit query parameters)
 @router.get(
         "", 
-        response_model=list[CharacterPublic], 
+        response_model=list[CharacterPublic],
         summary="Get all the characters",
         responses={
             status.HTTP_200_OK: {
@@ -107,14 +261,16 @@ async def create_character(
                             "secret_name": "Steve Rogers",
                             "age": 105,
                             "character_type": "Hero",
-                            "character_id": 3
+                            "character_id": 3,
+                            "version": 1
                         },
                         {
                             "name": "Iron Man",
                             "secret_name": "Tony Stark",
                             "age": 36,
                             "character_type": "Hero",
-                            "character_id": 1
+                            "character_id": 1,
+                            "version": 1
                         }]
                     }
                 }
@@ -122,10 +278,23 @@ async def create_character(
         }
 )
 
+@query_budget(2)
 async def read_characters(
     session: SessionDep,
+    request: Request,
+    response: Response,
     offset: Annotated[int, Query()] = 0,
-    limit: Annotated[int, Query()] = 10
+    limit: Annotated[int, Query()] = 10,
+    cursor: Annotated[str | None, Query()] = None,
+    include: Annotated[Literal["powers"] | None, Query()] = None,
+    character_type: Annotated[Literal["hero", "villain"] | None, Query()] = None,
+    min_age: Annotated[int | None, Query(ge=0)] = None,
+    max_age: Annotated[int | None, Query(ge=0)] = None,
+    name_prefix: Annotated[str | None, Query(min_length=1, max_length=100)] = None,
+    sort: Annotated[
+        Literal["id", "name", "-name", "total_damage", "-total_damage"], Query()
+    ] = "id",
+    ids: Annotated[str | None, Query(examples=["3,1,2"])] = None
 ):
     """
         Function to return all the characters in the database with the optional query
@@ -134,16 +303,136 @@ async def read_characters(
 
         - **offset**: int query param for pagination
         - **limit**: the maximum quantity of characters returned
+        - **cursor**: opaque cursor for keyset pagination, taken from the X-Next-Cursor
+        header of the previous page (valid only with the same sort)
+        - **include** (opt): "powers" to return each character with their powers
+        - **character_type** (opt): only heroes or villains (hero or villain)
+        - **min_age**, **max_age** (opt): age range (both included)
+        - **name_prefix** (opt): the beginning of the name (case insensitive)
+        - **sort** (opt): id (default), name, total_damage (sum of the damage of the
+        character's powers), or -name, -total_damage (descending)
+        - **ids** (opt): comma separated character IDs (up to 100) to get only those
+        characters, in the same order, with one query. The IDs not found are returned in the
+        X-Missing-Ids header. It can't be combined with the cursor, the filters or the sort
     """
-    # Get and return the characters
-    characters = CharacterCrud.read_characters(
+    # Validate the age range
+    if min_age is not None and max_age is not None and min_age > max_age:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="min_age must be lower than or equal to max_age"
+        )
+
+    # Get the IDs of a batch fetch (raise 422 if the list is invalid)
+    character_ids = None
+    if ids is not None:
+        character_ids = parse_id_list(ids)
+        if character_ids is None or len(character_ids) > MAX_BATCH_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=(
+                    f"ids must be a comma separated list of up to {MAX_BATCH_IDS} IDs "
+                    f"(from 1 to {MAX_ID})"
+                )
+            )
+        if cursor is not None or sort != "id" or any(
+            value is not None for value in (character_type, min_age, max_age, name_prefix)
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="ids can't be combined with cursor, filters or sort"
+            )
+
+    # Get the last character of the previous page
+    after_id, after_value = get_sort_cursor(
+        cursor, sort, SORT_VALUE_TYPES.get(sort.lstrip("-"))
+    )
+
+    # Get the characters
+    characters = await CharacterCrud.read_characters(
         session=session, 
         character_id=None,
         offset=offset,
-        limit=limit
+        limit=limit,
+        after_id=after_id,
+        include_powers=include == "powers",
+        character_type=character_type,
+        min_age=min_age,
+        max_age=max_age,
+        name_prefix=name_prefix,
+        sort=sort,
+        after_value=after_value,
+        character_ids=character_ids
     )
 
-    return characters
+    # Report the IDs of a batch fetch that weren't found, or add the cursor of the next page
+    if character_ids is not None:
+        found = {character.character_id for character in characters}
+        response.headers["X-Missing-Ids"] = ",".join(
+            str(character_id) for character_id in character_ids if character_id not in found
+        )
+    else:
+        set_next_cursor(response, characters, limit, sort)
+
+    # Build the characters (with their already loaded powers if requested)
+    public_model = CharacterPublicWithPowers if include == "powers" else CharacterPublic
+    content = [
+        public_model.model_validate(character).model_dump(mode="json") for character in characters
+    ]
+
+    # Return 304 if the client already has this page, else return the characters as built
+    # (already validated, and with their powers only when requested)
+    not_modified_response = not_modified(request, response, content_etag(content))
+    if not_modified_response:
+        return not_modified_response
+
+    return ORJSONResponse(content=content, headers=response.headers)
+
+
+# Search characters by name and secret name (declared before /{character_id})
+@router.get(
+        "/search",
+        response_model=list[CharacterSearchResult],
+        summary="Search characters by name or secret name",
+        responses={
+            status.HTTP_200_OK: {
+                "content": {
+                    "application/json": {
+                        "example": [
+                            {
+                                "name": "Spider-Man",
+                                "secret_name": "Peter Parker",
+                                "age": 25,
+                                "character_type": "Hero",
+                                "character_id": 1,
+                                "version": 1,
+                                "rank": 1.06
+                            }
+                        ]
+                    }
+                }
+            }
+        }
+)
+@query_budget(1)
+async def search_characters(
+    session: SessionDep,
+    q: Annotated[str, Query(min_length=1, max_length=100)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 10
+) -> list[CharacterSearchResult]:
+
+    """ Function to search characters by name or secret name, best matches first.
+        Matches word prefixes ("spid"), substrings ("der-ma") and names with typos ("spidr").
+
+        - **q**: the text to search
+        - **limit**: the maximum quantity of characters returned (default 10)
+    """
+
+    results = await CharacterCrud.search_characters(session=session, q=q, limit=limit)
+
+    return [
+        CharacterSearchResult(**CharacterPublic.model_validate(character).model_dump(), rank=rank)
+        for character, rank in results
+    ]
 
 
 # Get one character
@@ -160,7 +449,14 @@ async def read_characters(
                             "secret_name": "Steve Rogers",
                             "age": 105,
                             "character_type": "Hero",
-                            "character_id": 3
+                            "character_id": 3,
+                            "version": 1,
+                            "stats": {
+                                "power_count": 2,
+                                "total_damage": 450,
+                                "max_damage": 300,
+                                "avg_damage": 225.0
+                            }
                         }
                     }
                 }
@@ -176,24 +472,40 @@ async def read_characters(
             }
         }
 )
+@query_budget(1)
 async def read_character_id(
     session: SessionDep,
-    character_id: int
+    request: Request,
+    response: Response,
+    character_id: IdPath
 ):
     """ Function to return one character by passing their character_id
 
         - **character_id**: character's ID.
     """
 
-    # Get the character
-    character = CharacterCrud.read_characters(session=session, character_id=character_id)
+    # Get the character (from the cache when possible)
+    character = await cache.get_json(character_key(character_id))
+
+    if character is None:
+        character = await CharacterCrud.read_characters(session=session, character_id=character_id)
     
-    # If read_characters returns None, raise a 404 not found status code
-    if not character:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Character not found!"
-        )
+        # If read_characters returns None, raise a 404 not found status code
+        if not character:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Character not found!"
+            )
+
+        character = CharacterPublic.model_validate(character).model_dump(mode="json")
+        await cache.set_json(character_key(character_id), character)
+
+    # Return 304 if the client already has this character (the ETag covers the stats too, as
+    # they change without a new version of the character)
+    etag = content_etag(character)
+    not_modified_response = not_modified(request, response, etag)
+    if not_modified_response:
+        return not_modified_response
     
     # Return the character
     return character
@@ -214,25 +526,31 @@ async def read_character_id(
                             "secret_name": None,
                             "age": None,
                             "character_type": "Villain",
-                            "character_id": 13
+                            "character_id": 13,
+                            "version": 1
                         },
                         {
                             "name": "Venom",
                             "secret_name": "Eddie Brock",
                             "age": 38,
                             "character_type": "Villain",
-                            "character_id": 14
+                            "character_id": 14,
+                            "version": 1
                         }]
                     }
                 }
             }
         }
 )
+@query_budget(1)
 async def getall_heroes_or_villains(
     session: SessionDep,
+    request: Request,
+    response: Response,
     character_type: str,
     offset: Annotated[int, Query()] = 0,
-    limit: Annotated[int, Query()] = 10
+    limit: Annotated[int, Query()] = 10,
+    cursor: Annotated[str | None, Query()] = None
 ) -> list[CharacterPublic]:
     
     """ Function to return all the heroes or all the villains from the database by passing the
@@ -242,14 +560,20 @@ async def getall_heroes_or_villains(
         - **character_type**: the clasification of the character (hero or villain)
         - **offset**: int query parameter to allow pagination (default 0)
         - **limit**: the maximum quantity of characters returned (default 10)
+        - **cursor**: opaque cursor for keyset pagination, taken from the X-Next-Cursor
+        header of the previous page
     """
 
+    # Get the last character_id of the previous page
+    after_id = get_cursor_id(cursor)
+
     # Get the heroes or villains and return them
-    characters = CharacterCrud.get_heroes_or_villains(
+    characters = await CharacterCrud.get_heroes_or_villains(
         session=session, 
         character_type=character_type,
         offset=offset,
-        limit=limit
+        limit=limit,
+        after_id=after_id
     )
 
     if characters is None:
@@ -258,6 +582,17 @@ async def getall_heroes_or_villains(
             detail="character_type must be 'hero' or 'villain'"
         )
 
+    set_next_cursor(response, characters, limit)
+
+    # Return 304 if the client already has this page
+    content = [
+        CharacterPublic.model_validate(character).model_dump(mode="json")
+        for character in characters
+    ]
+    not_modified_response = not_modified(request, response, content_etag(content))
+    if not_modified_response:
+        return not_modified_response
+
     return characters
 ###################################################################################################
 
@@ -278,16 +613,18 @@ async def getall_heroes_or_villains(
                             "secret_name": None,
                             "age": 65,
                             "character_type": "Villain",
-                            "character_id": 13
+                            "character_id": 13,
+                            "version": 1
                         }
                     }
                 }
             }
         }
 )
+@query_budget(3)
 async def update_character(
     session: SessionDep,
-    character_id: int,
+    character_id: IdPath,
     character_update: Annotated[
         CharacterUpdate,
         Body(example={
@@ -311,7 +648,7 @@ async def update_character(
     character_dict = character_update.model_dump(exclude_unset=True)
 
     # Update the character
-    response = CharacterCrud.update_character(
+    response = await CharacterCrud.update_character(
         session=session,
         character_id=character_id,
         args=character_dict
@@ -348,7 +685,8 @@ async def update_character(
                             "secret_name": None,
                             "age": None,
                             "character_type": "Villain",
-                            "character_id": 0
+                            "character_id": 0,
+                            "version": 1
                         }
                     }
                 }},
@@ -362,9 +700,11 @@ async def update_character(
                 }}
         }
 )
+# Character (with stats), powers, and the deletes of the links, stats and character
+@query_budget(5)
 async def delete_character(
     session: SessionDep,
-    character_id: int
+    character_id: IdPath
 ) -> CharacterPublic:
     
     """
@@ -373,7 +713,7 @@ async def delete_character(
         - **character_id**: character's ID
     """
     # Delete the character
-    deleted_character = CharacterCrud.delete_character(
+    deleted_character = await CharacterCrud.delete_character(
         session=session,
         character_id=character_id
     )
@@ -0,0 +1,142 @@
+#############################
+#   API Router for export   #
+#############################
+
+###################################################################################################
+# Imports
+from typing import Annotated, AsyncIterator
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from app.db.database import async_session_maker
+from app.crud.export import ExportCrud
+from app.models.characters import CharacterPublicWithPowers
+from app.models.powers import PowerPublic
+from app.auth.auth import get_current_user
+###################################################################################################
+
+
+###################################################################################################
+# Router configuration
+router = APIRouter(
+    prefix="/export",
+    tags=["Export"]
+)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+###################################################################################################
+
+
+###################################################################################################
+# NDJSON streams
+# The streams open their own session: the request's session (SessionDep) is closed before the
+# response body is sent.
+
+async def character_lines(character_type: str | None) -> AsyncIterator[bytes]:
+    async with async_session_maker() as session:
+        async for characters in ExportCrud.stream_characters(
+            session=session, character_type=character_type
+        ):
+            yield b"".join(
+                orjson.dumps(
+                    CharacterPublicWithPowers.model_validate(character).model_dump(mode="json"),
+                    option=orjson.OPT_APPEND_NEWLINE
+                )
+                for character in characters
+            )
+
+
+async def power_lines() -> AsyncIterator[bytes]:
+    async with async_session_maker() as session:
+        async for powers in ExportCrud.stream_powers(session=session):
+            yield b"".join(
+                orjson.dumps(
+                    PowerPublic.model_validate(power).model_dump(mode="json"),
+                    option=orjson.OPT_APPEND_NEWLINE
+                )
+                for power in powers
+            )
+###################################################################################################
+
+
+###################################################################################################
+# Endpoints
+###################################################################################################
+
+###################################################################################################
+# Endpoint to export the characters with their powers
+@router.get(
+    "/characters.ndjson",
+    dependencies=[Depends(get_current_user)],
+    response_class=StreamingResponse,
+    summary="Export the characters with their powers (NDJSON)",
+    responses={
+        status.HTTP_200_OK: {
+            "content": {
+                NDJSON_MEDIA_TYPE: {
+                    "example": (
+                        '{"name":"Spider-Man","secret_name":"Peter Parker","age":25,'
+                        '"character_type":"Hero","character_id":1,"version":1,"powers":'
+                        '[{"power_name":"Web","power_damage":300,"power_id":1,"version":1}]}\n'
+                    )
+                }
+            }
+        },
+        status.HTTP_422_UNPROCESSABLE_ENTITY: {
+            "content": {
+                "application/json": {
+                    "example": {"detail": "character_type must be 'hero' or 'villain'"}
+                }
+            }
+        }
+    }
+)
+async def export_characters(
+    character_type: Annotated[str | None, Query()] = None
+) -> StreamingResponse:
+
+    """ Function to stream every character with their powers, one JSON object per line.
+        The rows are read from a server-side cursor, so the memory used doesn't depend on
+        the size of the table.
+
+        - **character_type** (opt): only heroes or villains (hero or villain)
+    """
+
+    if character_type is not None and character_type not in ("hero", "villain"):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="character_type must be 'hero' or 'villain'"
+        )
+
+    return StreamingResponse(character_lines(character_type), media_type=NDJSON_MEDIA_TYPE)
+###################################################################################################
+
+
+###################################################################################################
+# Endpoint to export the powers
+@router.get(
+    "/powers.ndjson",
+    dependencies=[Depends(get_current_user)],
+    response_class=StreamingResponse,
+    summary="Export the powers (NDJSON)",
+    responses={
+        status.HTTP_200_OK: {
+            "content": {
+                NDJSON_MEDIA_TYPE: {
+                    "example": (
+                        '{"power_name":"Web","power_damage":300,"power_id":1,"version":1}\n'
+                    )
+                }
+            }
+        }
+    }
+)
+async def export_powers() -> StreamingResponse:
+
+    """ Function to stream every power, one JSON object per line.
+        The rows are read from a server-side cursor, so the memory used doesn't depend on
+        the size of the table.
+    """
+
+    return StreamingResponse(power_lines(), media_type=NDJSON_MEDIA_TYPE)
+###################################################################################################
@@ -0,0 +1,185 @@
+#############################
+#   API Router for health   #
+#############################
+
+###################################################################################################
+# Imports
+import asyncio
+import logging
+from fastapi import APIRouter, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
+from app.db.database import async_engine, DB_POOL_SIZE
+from app.db.migrations import get_head_revision, get_database_revision
+###################################################################################################
+
+
+###################################################################################################
+# Router configuration
+router = APIRouter(
+    tags=["Health"]
+)
+
+logger = logging.getLogger("app.health")
+###################################################################################################
+
+
+###################################################################################################
+# Readiness state
+readiness = {
+    # Revision of the latest migration (read once from the alembic scripts)
+    "expected_revision": None,
+    # The database is at the latest migration
+    "schema_ok": False,
+    # The pool connections were opened
+    "pool_warm": False,
+}
+
+_warm_up_task: asyncio.Task | None = None
+
+
+async def check_schema() -> str | None:
+
+    """ Function to compare the database's alembic_version with the latest migration.
+        Once the schema is up to date only a ping is sent to the database.
+
+        :return: None if the schema is up to date, or the reason why it isn't
+    """
+
+    if readiness["schema_ok"]:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        return None
+
+    if readiness["expected_revision"] is None:
+        readiness["expected_revision"] = get_head_revision()
+
+    current = await get_database_revision(async_engine)
+    expected = readiness["expected_revision"]
+    if current != expected:
+        return f"Database schema is at revision {current}, expected {expected}"
+
+    readiness["schema_ok"] = True
+    return None
+
+
+async def warm_up_pool():
+
+    """ Function to check the schema version and open the pool's connections concurrently,
+        returning them to the pool, so the first requests don't pay for the connection setup.
+    """
+
+    try:
+        reason = await check_schema()
+    except Exception as error:
+        logger.warning("Database unreachable: %r", error)
+        return
+    if reason is not None:
+        logger.error(reason)
+        return
+
+    connections = []
+    try:
+        connections = await asyncio.gather(
+            *(async_engine.connect() for _ in range(DB_POOL_SIZE)), return_exceptions=True
+        )
+        errors = [connection for connection in connections if isinstance(connection, Exception)]
+        if errors:
+            logger.warning("Pool warm-up failed: %r", errors[0])
+        else:
+            readiness["pool_warm"] = True
+    finally:
+        for connection in connections:
+            if not isinstance(connection, Exception):
+                await connection.close()
+
+
+def start_warm_up():
+
+    """ Function to start the schema check and pool warm-up in the background
+        (if it isn't running)
+    """
+
+    global _warm_up_task
+    if readiness["pool_warm"] or (_warm_up_task is not None and not _warm_up_task.done()):
+        return
+    _warm_up_task = asyncio.create_task(warm_up_pool())
+###################################################################################################
+
+
+###################################################################################################
+# Endpoints
+###################################################################################################
+
+###################################################################################################
+# Liveness probe
+@router.get(
+    "/healthz",
+    status_code=status.HTTP_200_OK,
+    summary="Liveness probe",
+    responses={
+        status.HTTP_200_OK:{
+            "content": {
+                "application/json": {
+                    "example": {"status": "ok"}
+                }
+            }
+        }
+    }
+)
+async def healthz() -> dict:
+
+    """ Function to check that the process is alive. It doesn't touch the database.
+    """
+
+    return {"status": "ok"}
+###################################################################################################
+
+
+###################################################################################################
+# Readiness probe
+@router.get(
+    "/readyz",
+    status_code=status.HTTP_200_OK,
+    summary="Readiness probe",
+    responses={
+        status.HTTP_200_OK:{
+            "content": {
+                "application/json": {
+                    "example": {"status": "ready", "revision": "<latest alembic revision>"}
+                }
+            }
+        },
+        status.HTTP_503_SERVICE_UNAVAILABLE: {
+            "content": {
+                "application/json": {
+                    "example": {"status": "not ready", "detail": "Connection pool warming up"}
+                }
+            }
+        }
+    }
+)
+async def readyz():
+
+    """ Function to check that the instance can serve traffic: the database is reachable,
+        its schema is at the latest migration and the connection pool is warm.
+    """
+
+    try:
+        reason = await check_schema()
+    except Exception as error:
+        logger.warning("Readiness check failed: %r", error)
+        reason = "Database unreachable"
+
+    if reason is None and not readiness["pool_warm"]:
+        start_warm_up()
+        reason = "Connection pool warming up"
+
+    if reason is not None:
+        return ORJSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "not ready", "detail": reason}
+        )
+
+    return {"status": "ready", "revision": readiness["expected_revision"]}
+###################################################################################################
@@ -0,0 +1,113 @@
+#############################
+#   API Router for import   #
+#############################
+
+###################################################################################################
+# Imports
+from typing import Annotated, Literal
+from fastapi import APIRouter, Depends, status, Query, Request
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_async_session
+from app.crud.imports import ImportCrud, IMPORT_BATCH_SIZE, detect_format, read_records
+from app.models.imports import ImportProgress
+from app.auth.auth import get_current_user
+###################################################################################################
+
+
+###################################################################################################
+# Router configuration
+router = APIRouter(
+    prefix="/import",
+    tags=["Import"]
+)
+###################################################################################################
+
+
+###################################################################################################
+# Session dependency
+SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+###################################################################################################
+
+
+###################################################################################################
+# Endpoints
+###################################################################################################
+
+###################################################################################################
+# Endpoint to import characters, powers and links from a file
+@router.post(
+    "",
+    dependencies=[Depends(get_current_user)],
+    response_model=ImportProgress,
+    summary="Import characters, powers and their links (NDJSON or CSV)",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {
+                    "schema": {"type": "string"},
+                    "example": (
+                        '{"power_name":"Web","power_damage":300,"power_id":1}\n'
+                        '{"name":"Spider-Man","secret_name":"Peter Parker","age":25,'
+                        '"character_type":"Hero","character_id":1}\n'
+                        '{"character_id":1,"power_id":1}\n'
+                    )
+                },
+                "text/csv": {
+                    "schema": {"type": "string"},
+                    "example": "power_name,power_damage\nWeb,300\nFlight,150\n"
+                }
+            }
+        }
+    },
+    responses={
+        status.HTTP_200_OK: {
+            "content": {
+                "application/json": {
+                    "example": {
+                        "lines": 1250,
+                        "characters": 500,
+                        "powers": 150,
+                        "links": 600,
+                        "skipped_links": 0,
+                        "errors": 0,
+                        "error_samples": [],
+                        "done": True
+                    }
+                }
+            }
+        }
+    }
+)
+async def import_file(
+    session: SessionDep,
+    request: Request,
+    file_format: Annotated[Literal["ndjson", "csv"] | None, Query(alias="format")] = None,
+    batch_size: Annotated[int, Query(ge=1, le=10000)] = IMPORT_BATCH_SIZE
+) -> ImportProgress:
+
+    """ Function to import a file, sent as the request body, with one power, character or
+        link per line. Existing powers (by power_name) and characters (by character_id) are
+        updated. The body is read as a stream and the rows are written and committed in
+        batches (the progress is logged after every batch), so the size of the file doesn't
+        change the memory used. For very large files use the CLI: python -m app.importer
+
+        - **body**: NDJSON (the lines of the exports are accepted as is) or CSV with a
+        header: power_name, power_damage, power_id (opt) for powers; name, secret_name, age,
+        character_type, character_id (opt) for characters; character_id, power_id for links
+        - **format** (opt): ndjson or csv (default: taken from the Content-Type)
+        - **batch_size** (opt): rows of each kind written per transaction
+    """
+
+    file_format = file_format or detect_format(request.headers.get("content-type"))
+
+    # Import the records as they arrive and return the final report
+    async for progress in ImportCrud.import_records(
+        session=session,
+        records=read_records(request.stream(), file_format),
+        batch_size=batch_size
+    ):
+        pass
+
+    return progress
+###################################################################################################
@@ -0,0 +1,177 @@
+##################################
+#   API Router for leaderboard   #
+##################################
+
+###################################################################################################
+# Imports
+from typing import Annotated, Literal
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Path
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_async_session
+from app.crud.characters import CharacterCrud
+from app.cache.leaderboard import leaderboard
+from app.models.leaderboard import LeaderboardPage, LeaderboardEntry, LeaderboardRank
+from app.monitoring.queries import query_budget
+from app.crud.filters import MAX_ID
+###################################################################################################
+
+
+###################################################################################################
+# Router configuration
+router = APIRouter(
+    prefix="/leaderboard",
+    tags=["Leaderboard"]
+)
+###################################################################################################
+
+
+###################################################################################################
+# Session dependency
+SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+
+# ID path parameters (the ID columns are 32-bit integers: larger IDs are rejected with a 422)
+IdPath = Annotated[int, Path(ge=1, le=MAX_ID)]
+###################################################################################################
+
+
+###################################################################################################
+# Endpoints
+###################################################################################################
+
+###################################################################################################
+# Endpoint to get the ranking of heroes or villains
+@router.get(
+    "",
+    response_model=LeaderboardPage,
+    summary="Rank the heroes or the villains by the damage of their powers",
+    responses={
+        status.HTTP_200_OK: {
+            "content": {
+                "application/json": {
+                    "example": {
+                        "character_type": "hero",
+                        "ranked": 2,
+                        "entries": [
+                            {
+                                "rank": 1,
+                                "character_id": 1,
+                                "name": "Spider-Man",
+                                "total_damage": 800
+                            },
+                            {
+                                "rank": 2,
+                                "character_id": 3,
+                                "name": "Captain America",
+                                "total_damage": 450
+                            }
+                        ]
+                    }
+                }
+            }
+        }
+    }
+)
+# One query for the names (plus one to build the ranking if it isn't built yet)
+@query_budget(2)
+async def read_leaderboard(
+    session: SessionDep,
+    character_type: Annotated[Literal["hero", "villain"], Query(alias="type")],
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    offset: Annotated[int, Query(ge=0)] = 0
+) -> LeaderboardPage:
+
+    """ Function to return a page of the ranking of heroes or villains, by the total damage
+        of their powers (highest first, ties by character_id). The ranking is kept in memory
+        and updated when powers are assigned, removed or changed.
+
+        - **type**: hero or villain
+        - **limit** (opt): the maximum quantity of characters returned
+        - **offset** (opt): the characters skipped (rank offset + 1 is the first returned)
+    """
+
+    await leaderboard.ensure_built(session)
+
+    # Get the page and the names of its characters
+    page = leaderboard.top(character_type, limit, offset)
+    names = await CharacterCrud.read_names(
+        session=session, character_ids=[character_id for _, character_id, _ in page]
+    )
+
+    return LeaderboardPage(
+        character_type=character_type,
+        ranked=leaderboard.size(character_type),
+        entries=[
+            LeaderboardEntry(
+                rank=rank,
+                character_id=character_id,
+                name=names.get(character_id, ""),
+                total_damage=total_damage
+            )
+            for rank, character_id, total_damage in page
+        ]
+    )
+
+
+# Endpoint to get the rank of one character
+@router.get(
+    "/characters/{character_id}",
+    response_model=LeaderboardRank,
+    summary="Get the rank of a character",
+    responses={
+        status.HTTP_200_OK: {
+            "content": {
+                "application/json": {
+                    "example": {
+                        "rank": 2,
+                        "character_id": 3,
+                        "name": "Captain America",
+                        "total_damage": 450,
+                        "character_type": "hero",
+                        "ranked": 2
+                    }
+                }
+            }
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Character not found!"
+                    }
+                }
+            }
+        }
+    }
+)
+@query_budget(2)
+async def read_character_rank(
+    session: SessionDep,
+    character_id: IdPath
+) -> LeaderboardRank:
+
+    """ Function to return the rank of a character in the ranking of their type
+
+        - **character_id**: character's ID.
+    """
+
+    await leaderboard.ensure_built(session)
+
+    position = leaderboard.rank(character_id)
+    if position is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found!"
+        )
+
+    character_type, rank, total_damage = position
+    names = await CharacterCrud.read_names(session=session, character_ids=[character_id])
+
+    return LeaderboardRank(
+        rank=rank,
+        character_id=character_id,
+        name=names.get(character_id, ""),
+        total_damage=total_damage,
+        character_type=character_type,
+        ranked=leaderboard.size(character_type)
+    )
+###################################################################################################
@@ -7,12 +7,13 @@
 from typing import Annotated
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Body
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session
-from app.auth.hashing import verify_password
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.auth.hashing import verify_password_async, HashingPoolFull
 from app.auth.auth import get_access_token, TOKEN_EXPIRE_MINUTES
-from app.db.database import get_session
+from app.monitoring.queries import query_budget
+from app.db.database import get_async_session
 from app.models.users import User, UserIn, UserOut
 from app.crud.users import UserCrud
 ####################################################################################################
@@ -29,7 +30,7 @@ router = APIRouter(
 
 ###################################################################################################
 # Session dependency
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 ###################################################################################################
 
 
@@ -62,16 +63,26 @@ SessionDep = Annotated[Session, Depends(get_session)]
                     }
                 }
             }
+        },
+        status.HTTP_429_TOO_MANY_REQUESTS: {
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Too many requests, try again later"
+                    }
+                }
+            }
         }
     }
 )
+@query_budget(1)
 async def login_for_access_token(
     session: SessionDep,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
-) -> JSONResponse:
+) -> ORJSONResponse:
     
     # Get the hashed_password using form_date.username
-    hashed_password = UserCrud.get_hashed_password(
+    hashed_password = await UserCrud.get_hashed_password(
         session=session,
         username=form_data.username
     )
@@ -84,11 +95,18 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"}
         )
     
-    # Verify the password passed with the hashed_password
-    user = verify_password(
-        plain_password=form_data.password,
-        hashed_password=hashed_password
-    )
+    # Verify the password passed with the hashed_password (raise 429 if the hashing pool is full)
+    try:
+        user = await verify_password_async(
+            plain_password=form_data.password,
+            hashed_password=hashed_password
+        )
+    except HashingPoolFull:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, try again later",
+            headers={"Retry-After": "1"}
+        )
 
     # Raise exception if the password is incorrect
     if not user:
@@ -106,7 +124,7 @@ async def login_for_access_token(
         expiration=access_token_expires
     )
 
-    response = JSONResponse(
+    response = ORJSONResponse(
         content={
             "access_token": access_token,
             "token_type":"bearer"
@@ -0,0 +1,38 @@
+##############################
+#   API Router for Metrics   #
+##############################
+
+###################################################################################################
+# Imports
+import os
+from fastapi import APIRouter, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, CollectorRegistry, multiprocess
+###################################################################################################
+
+
+###################################################################################################
+# Router configuration
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"]
+)
+###################################################################################################
+
+
+###################################################################################################
+# Endpoint to expose the metrics in Prometheus text format
+@router.get("", summary="Prometheus metrics", include_in_schema=False)
+async def metrics() -> Response:
+
+    """ Function to return the application's metrics in Prometheus text format.
+        With many workers (PROMETHEUS_MULTIPROC_DIR set) the metrics of every worker
+        are aggregated.
+    """
+
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+###################################################################################################
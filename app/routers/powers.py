@@ -4,13 +4,21 @@
 
 ###################################################################################################
 # Imports
-from typing import Annotated
-from fastapi import APIRouter, Depends, status, HTTPException, Body, Query
-from sqlmodel import Session
-from app.db.database import engine, get_session
-from app.models.powers import Powers, PowerCreate, PowerPublic, PowerUpdate
+from typing import Annotated, Literal
+from fastapi import APIRouter, Depends, status, HTTPException, Body, Query, Request, Response, Path
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_async_session
+from app.models.powers import (
+    Powers, PowerCreate, PowerPublic, PowerUpdate, PowerBulkResult, PowerPublicWithCount
+)
+from app.models.characters import CharacterPublic
 from app.crud.powers import PowersCrud
+from app.crud.pagination import encode_cursor, get_cursor_id, get_sort_cursor
+from app.crud.filters import parse_id_list, MAX_BATCH_IDS, MAX_ID
+from app.cache.cache import cache, power_key
+from app.cache.etag import row_etag, content_etag, not_modified
 from app.auth.auth import get_current_user
+from app.monitoring.queries import query_budget
 ###################################################################################################
 
 
@@ -25,7 +33,10 @@ router = APIRouter(
 
 ###################################################################################################
 # Session dependency
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+
+# ID path parameters (the ID columns are 32-bit integers: larger IDs are rejected with a 422)
+IdPath = Annotated[int, Path(ge=1, le=MAX_ID)]
 ###################################################################################################
 
 
@@ -49,13 +60,15 @@ SessionDep = Annotated[Session, Depends(get_session)]
                     "example":{
                         "power_name": "Time Manipulation",
                         "power_damage": 100,
-                        "power_id": 0
+                        "power_id": 0,
+                        "version": 1
                     }
                 }
             }
         }
     }
 )
+@query_budget(2)
 async def create_power(
     session: SessionDep,
     power: Annotated[
@@ -80,9 +93,94 @@ async def create_power(
     power_db = Powers.model_validate(power)
 
     # Create the power and return it
-    power_create = PowersCrud.create_power(session=session, power=power_db)
+    power_create = await PowersCrud.create_power(session=session, power=power_db)
 
     return power_create
+
+
+# Endpoint to create many powers at once
+@router.post(
+    "/bulk",
+    dependencies=[Depends(get_current_user)],
+    response_model=PowerBulkResult,
+    response_model_exclude_none=True,
+    summary="Create many powers",
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        201: {
+            "description": "Created",
+            "content":{
+                "application/json":{
+                    "example":{
+                        "created": 1,
+                        "conflicts": 1,
+                        "results": [
+                            {
+                                "index": 0,
+                                "status": "created",
+                                "power": {
+                                    "power_name": "Time Manipulation",
+                                    "power_damage": 100,
+                                    "power_id": 0,
+                                    "version": 1
+                                }
+                            },
+                            {
+                                "index": 1,
+                                "status": "conflict",
+                                "detail": "The power_name already exists!"
+                            }
+                        ]
+                    }
+                }
+            }
+        }
+    }
+)
+async def create_powers(
+    session: SessionDep,
+    powers: Annotated[
+        list[PowerCreate],
+        Body(
+            max_length=10000,
+            example=[
+                {"power_name": "Time Manipulation", "power_damage": 100},
+                {"power_name": "Repulsor Blast", "power_damage": 250}
+            ]
+        )
+    ]
+) -> PowerBulkResult:
+
+    """ Function to create many powers in a single transaction by passing a JSON list
+        (up to 10000 items) with the same fields as the single create endpoint.
+        Powers whose power_name already exists are reported as conflicts.
+    """
+
+    # Validate each PowerCreate model
+    powers_db = [Powers.model_validate(power) for power in powers]
+
+    # Create the powers
+    created = await PowersCrud.create_powers(session=session, powers=powers_db)
+
+    # Build the result of each power
+    results = []
+    for index, power in enumerate(created):
+        if power is None:
+            results.append({
+                "index": index,
+                "status": "conflict",
+                "detail": "The power_name already exists!"
+            })
+        else:
+            results.append({"index": index, "status": "created", "power": power})
+
+    created_count = sum(power is not None for power in created)
+
+    return PowerBulkResult(
+        created=created_count,
+        conflicts=len(created) - created_count,
+        results=results
+    )
 ###################################################################################################
 
 
@@ -90,7 +188,7 @@ async def create_power(
 # Endpoint to get all the powers
 @router.get(
         "",
-        response_model=list[PowerPublic],
+        response_model=list[PowerPublicWithCount] | list[PowerPublic],
         status_code=status.HTTP_200_OK,
         summary="Get the powers",
         responses= {
@@ -101,12 +199,14 @@ async def create_power(
                             {
                                 "power_name": "Time Manipulation",
                                 "power_damage": 100,
-                                "power_id": 3
+                                "power_id": 3,
+                                "version": 1
                             },
                             {
                                 "power_name": "Repulsor Blast",
                                 "power_damage": 250,
-                                "power_id": 5
+                                "power_id": 5,
+                                "version": 1
                             }
                         ]
                     }
@@ -114,27 +214,135 @@ async def create_power(
             }
         }
 )
+@query_budget(1)
 async def read_all_powers(
     session: SessionDep,
+    request: Request,
+    response: Response,
     offset: Annotated[int, Query()] = 0,
-    limit: Annotated[int, Query()] = 10
-) -> list[PowerPublic]:
+    limit: Annotated[int, Query()] = 10,
+    cursor: Annotated[str | None, Query()] = None,
+    min_damage: Annotated[int | None, Query(ge=0, le=1000)] = None,
+    max_damage: Annotated[int | None, Query(ge=0, le=1000)] = None,
+    name_prefix: Annotated[str | None, Query(min_length=1, max_length=100)] = None,
+    sort: Annotated[Literal["id", "name", "-name", "damage", "-damage"], Query()] = "id",
+    with_counts: Annotated[bool, Query()] = False,
+    ids: Annotated[str | None, Query(examples=["3,1,2"])] = None
+):
     
     """ Function to get the powers from the database, with optional query parameters offset and
         limit.
 
         - **offset**: int query parameter for pagination (default = 0)
         - **limit**: the maximum number of powers returned (default = 10)
+        - **cursor**: opaque cursor for keyset pagination, taken from the X-Next-Cursor
+        header of the previous page (valid only with the same sort)
+        - **min_damage**, **max_damage** (opt): damage range (both included)
+        - **name_prefix** (opt): the beginning of the name (case insensitive)
+        - **sort** (opt): id (default), name, damage, -name or -damage (descending)
+        - **with_counts** (opt): add the number of characters that hold each power
+        (character_count)
+        - **ids** (opt): comma separated power IDs (up to 100) to get only those powers, in
+        the same order, with one query. The IDs not found are returned in the X-Missing-Ids
+        header. It can't be combined with the cursor, the filters or the sort
     """
 
-    # Get the powers and return them
-    powers = PowersCrud.read_powers(
-        session=session,
-        power_id = None,
-        offset=offset,
-        limit=limit
+    # Validate the damage range
+    if min_damage is not None and max_damage is not None and min_damage > max_damage:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="min_damage must be lower than or equal to max_damage"
+        )
+
+    # Get the IDs of a batch fetch (raise 422 if the list is invalid)
+    power_ids = None
+    if ids is not None:
+        power_ids = parse_id_list(ids)
+        if power_ids is None or len(power_ids) > MAX_BATCH_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=(
+                    f"ids must be a comma separated list of up to {MAX_BATCH_IDS} IDs "
+                    f"(from 1 to {MAX_ID})"
+                )
+            )
+        if cursor is not None or sort != "id" or any(
+            value is not None for value in (min_damage, max_damage, name_prefix)
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="ids can't be combined with cursor, filters or sort"
+            )
+
+    # Get the last power of the previous page (raise 422 if the cursor is invalid)
+    sort_field = {"name": "power_name", "damage": "power_damage"}.get(sort.lstrip("-"))
+    after_id, after_value = get_sort_cursor(
+        cursor, sort, {"power_name": str, "power_damage": int}.get(sort_field)
     )
 
+    # Get the powers (from the cache when possible). The counts change on every assignment,
+    # so the pages with counts aren't cached (nor the batch fetches)
+    powers = None
+    cacheable = not with_counts and power_ids is None
+    if cacheable:
+        key = await cache.list_key(
+            "powers", offset=offset, limit=limit, after_id=after_id, after_value=after_value,
+            min_damage=min_damage, max_damage=max_damage, name_prefix=name_prefix, sort=sort
+        )
+        powers = await cache.get_json(key)
+
+    if powers is None:
+        powers = await PowersCrud.read_powers(
+            session=session,
+            power_id = None,
+            offset=offset,
+            limit=limit,
+            after_id=after_id,
+            min_damage=min_damage,
+            max_damage=max_damage,
+            name_prefix=name_prefix,
+            sort=sort,
+            after_value=after_value,
+            with_counts=with_counts,
+            power_ids=power_ids
+        )
+        if with_counts:
+            powers = [
+                {
+                    **PowerPublic.model_validate(power).model_dump(mode="json"),
+                    "character_count": character_count
+                }
+                for power, character_count in powers
+            ]
+        else:
+            powers = [
+                PowerPublic.model_validate(power).model_dump(mode="json") for power in powers
+            ]
+        if cacheable:
+            await cache.set_json(key, powers)
+
+    # Report the IDs of a batch fetch that weren't found
+    if power_ids is not None:
+        found = {power["power_id"] for power in powers}
+        response.headers["X-Missing-Ids"] = ",".join(
+            str(power_id) for power_id in power_ids if power_id not in found
+        )
+
+    # Add the cursor of the next page when the page is full and return the powers
+    elif powers and len(powers) == limit:
+        last = powers[-1]
+        if sort_field is None:
+            response.headers["X-Next-Cursor"] = encode_cursor(last["power_id"])
+        else:
+            response.headers["X-Next-Cursor"] = encode_cursor(
+                last["power_id"], sort, last[sort_field]
+            )
+
+    # Return 304 if the client already has this page
+    not_modified_response = not_modified(request, response, content_etag(powers))
+    if not_modified_response:
+        return not_modified_response
+
     return powers
 
 
@@ -150,7 +358,8 @@ async def read_all_powers(
                         "example": {
                             "power_name": "Time Manipulation",
                             "power_damage": 100,
-                            "power_id": 3
+                            "power_id": 3,
+                            "version": 1
                         }
                     }
                 }
@@ -167,9 +376,12 @@ async def read_all_powers(
             }
         }
 )
+@query_budget(1)
 async def get_one_power(
     session: SessionDep,
-    power_id: int
+    request: Request,
+    response: Response,
+    power_id: IdPath
 ) -> PowerPublic:
     
     """ Function to get only one power by passing its power_id
@@ -177,21 +389,108 @@ async def get_one_power(
         - **power_id**: the power's ID
     """
 
-    # Get the power
-    power = PowersCrud.read_powers(
+    # Get the power (from the cache when possible)
+    power = await cache.get_json(power_key(power_id))
+
+    if power is None:
+        power = await PowersCrud.read_powers(
+            session=session,
+            power_id=power_id
+        )
+
+        # Raise 404 if the power is None (couldn't get the power with power_id)
+        if power is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Couldn't get the power with the given power_id"
+            )
+
+        power = PowerPublic.model_validate(power).model_dump(mode="json")
+        await cache.set_json(power_key(power_id), power)
+
+    # Return 304 if the client already has this version of the power
+    etag = row_etag("powers", power_id, power["version"])
+    not_modified_response = not_modified(request, response, etag)
+    if not_modified_response:
+        return not_modified_response
+
+    # Return the power
+    return power
+###################################################################################################
+
+
+###################################################################################################
+# Endpoint to get the characters that hold a power
+@router.get(
+        "/{power_id}/characters",
+        response_model=list[CharacterPublic],
+        status_code=status.HTTP_200_OK,
+        summary="Get the characters that hold a power",
+        responses={
+            status.HTTP_200_OK: {
+                "content": {
+                    "application/json": {
+                        "example": [
+                            {
+                                "name": "Spider-Man",
+                                "secret_name": "Peter Parker",
+                                "age": 25,
+                                "character_type": "Hero",
+                                "character_id": 1,
+                                "version": 1
+                            }
+                        ]
+                    }
+                }
+            },
+            status.HTTP_404_NOT_FOUND: {
+                "content": {
+                    "application/json": {
+                        "example": {"detail": "Couldn't get the power with the given power_id"}
+                    }
+                }
+            }
+        }
+)
+@query_budget(2)
+async def read_power_characters(
+    session: SessionDep,
+    response: Response,
+    power_id: IdPath,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 10,
+    cursor: Annotated[str | None, Query()] = None
+) -> list[CharacterPublic]:
+
+    """ Function to get the characters that hold a power, ordered by character_id.
+
+        - **power_id**: the power's ID
+        - **limit**: the maximum number of characters returned (default = 10)
+        - **cursor**: opaque cursor for keyset pagination, taken from the X-Next-Cursor
+        header of the previous page
+    """
+
+    # Get the last character_id of the previous page (raise 422 if the cursor is invalid)
+    after_id = get_cursor_id(cursor)
+
+    characters = await PowersCrud.read_power_characters(
         session=session,
-        power_id=power_id
+        power_id=power_id,
+        limit=limit,
+        after_id=after_id
     )
 
-    # Raise 404 if the power is None (couldn't get the power with power_id)
-    if power is None:
+    # Raise 404 if the power doesn't exist
+    if characters is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Couldn't get the power with the given power_id"
         )
 
-    # Return the power
-    return power
+    # Add the cursor of the next page when the page is full
+    if len(characters) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(characters[-1].character_id)
+
+    return characters
 ###################################################################################################
 
 
@@ -224,9 +523,11 @@ async def get_one_power(
         }
     }
 )
+# Power, power update, holders' stats and refresh
+@query_budget(4)
 async def update_power(
     session: SessionDep,
-    power_id: int,
+    power_id: IdPath,
     power_update: Annotated[
         PowerUpdate,
         Body(
@@ -252,7 +553,7 @@ async def update_power(
     power_update_dict = power_update.model_dump(exclude_unset=True)
 
     # Update the power
-    power_to_update = PowersCrud.update_power(
+    power_to_update = await PowersCrud.update_power(
         session=session,
         power_id=power_id,
         power_update=power_update_dict
@@ -285,7 +586,8 @@ async def update_power(
                         "example": {
                             "power_name": "Time Manipulation",
                             "power_damage": 100,
-                            "power_id": 3
+                            "power_id": 3,
+                            "version": 1
                         }
                     }
                 }
@@ -302,9 +604,11 @@ async def update_power(
         }
     }
 )
+# Power, holders' stats, links (loaded and deleted) and power delete
+@query_budget(5)
 async def delete_power(
     session: SessionDep,
-    power_id: int
+    power_id: IdPath
 ) -> PowerPublic:
     
     """ Function to delete a power by passing its power_id
@@ -313,7 +617,7 @@ async def delete_power(
     """
 
     # Delete the power
-    power_deleted = PowersCrud.delete_power(session=session, power_id=power_id)
+    power_deleted = await PowersCrud.delete_power(session=session, power_id=power_id)
     
     # Raise an exception if delete_power returns None
     if power_deleted is None:
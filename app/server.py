@@ -0,0 +1,138 @@
+##########
+# Server #
+##########
+
+###################################################################################################
+# Usage
+#
+#   python -m app.server
+#
+# Runs the API with gunicorn and uvicorn workers. The database is initialized once in the
+# master process, before the workers are forked. Send SIGHUP to the master process to restart
+# the workers gracefully (with PRELOAD_APP=true the code is loaded in the master, so a code
+# change needs PRELOAD_APP=false or a full restart).
+###################################################################################################
+
+###################################################################################################
+# Imports
+import os
+import logging
+import tempfile
+from gunicorn.app.base import BaseApplication
+###################################################################################################
+
+
+###################################################################################################
+# Configuration
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+# Number of worker processes
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1)))
+# Maximum number of pending connections
+BACKLOG = int(os.getenv("BACKLOG", 2048))
+# Seconds to keep idle keep-alive connections open
+KEEP_ALIVE = int(os.getenv("KEEP_ALIVE", 5))
+# Seconds the workers have to finish their requests on restart or shutdown
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+# Seconds without answering the master before a worker is killed and replaced
+WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", 60))
+# Import the app in the master process before forking (shared memory, faster worker boot)
+PRELOAD_APP = os.getenv("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
+# Database initialization run once before forking: create_all, migrate (alembic) or none
+DB_INIT = os.getenv("DB_INIT", "create_all")
+
+logger = logging.getLogger("app.server")
+###################################################################################################
+
+
+###################################################################################################
+# Hooks
+
+# Runs once in the master process, before the workers are forked
+def on_starting(server):
+    if DB_INIT == "migrate":
+        from app.db.migrations import upgrade_to_head
+        upgrade_to_head()
+
+    elif DB_INIT == "create_all":
+        # Only creates the missing tables. A new database is stamped with the latest migration,
+        # an unversioned one with tables stops the launcher (it must be migrated)
+        from app.db.migrations import create_tables_and_stamp
+        create_tables_and_stamp()
+
+    # Close the master's connections so the workers don't share their sockets
+    from app.db.database import engine
+    engine.dispose()
+
+
+# Remove the metrics files of a dead worker
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+###################################################################################################
+
+
+###################################################################################################
+# Gunicorn application
+class Server(BaseApplication):
+
+    """ Gunicorn application that serves app.main:app with uvicorn workers """
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app.main import app
+        return app
+###################################################################################################
+
+
+###################################################################################################
+# Main
+def main():
+    # With many workers the metrics are shared through files (must be set before the import)
+    if WEB_CONCURRENCY > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus_")
+
+    # The memory cache is per worker (a write doesn't invalidate the other workers' entries):
+    # with many workers the cache is off unless a backend is chosen, and memory is warned about
+    if WEB_CONCURRENCY > 1:
+        cache_backend = os.getenv("CACHE_BACKEND")
+        if cache_backend is None:
+            os.environ["CACHE_BACKEND"] = "none"
+            logger.warning(
+                "CACHE_BACKEND isn't set: the cache is off with %d workers (set it to redis)",
+                WEB_CONCURRENCY
+            )
+        elif cache_backend == "memory":
+            logger.warning(
+                "CACHE_BACKEND=memory with %d workers: each worker only invalidates its own "
+                "cache, the others serve stale rows until CACHE_TTL_SECONDS expires (use redis)",
+                WEB_CONCURRENCY
+            )
+
+    options = {
+        "bind": f"{HOST}:{PORT}",
+        "workers": WEB_CONCURRENCY,
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "backlog": BACKLOG,
+        "keepalive": KEEP_ALIVE,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "timeout": WORKER_TIMEOUT,
+        "preload_app": PRELOAD_APP,
+        "on_starting": on_starting,
+        "child_exit": child_exit,
+    }
+
+    Server(options).run()
+
+
+if __name__ == "__main__":
+    main()
+###################################################################################################
@@ -0,0 +1,117 @@
+##############################################
+# Benchmark: battle simulation (N x M pairs) #
+##############################################
+
+###################################################################################################
+# Usage
+#
+#   python -m benchmarks.battle_simulation --heroes 10000 --villains 10000
+#
+# Scores heroes x villains matchups with random strengths (no database), with the vectorized
+# engine of POST /battles/simulate in both modes. A plain Python loop over the pairs is timed on
+# a sample and extrapolated, as the reference.
+###################################################################################################
+
+###################################################################################################
+# Imports
+import argparse
+import random
+import time
+import numpy as np
+from app.battles.simulation import simulate
+###################################################################################################
+
+
+###################################################################################################
+# Helpers
+def python_loop(hero_strength: list[float], villain_strength: list[float]) -> list[float]:
+
+    """ Function to score the matchups one pair at a time (the reference of expected mode) """
+
+    win_rates = []
+    for a in hero_strength:
+        wins = 0.0
+        for b in villain_strength:
+            if a == 0 and b == 0:
+                wins += 0.5
+            elif a >= b:
+                wins += 1 - b / (2 * a)
+            else:
+                wins += a / (2 * b)
+        win_rates.append(wins / len(villain_strength))
+    return win_rates
+
+
+def python_duels(
+    hero_strength: list[float],
+    villain_strength: list[float],
+    trials: int
+) -> list[float]:
+
+    """ Function to play the duels one at a time (the reference of Monte Carlo mode) """
+
+    duel = random.Random(42).random
+    win_rates = []
+    for a in hero_strength:
+        wins = 0
+        for b in villain_strength:
+            for _ in range(trials):
+                wins += duel() * a > duel() * b
+        win_rates.append(wins / (trials * len(villain_strength)))
+    return win_rates
+
+
+def timed(function, *args, **kwargs) -> float:
+
+    """ Function to return the duration (s) of a call """
+
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+###################################################################################################
+
+
+###################################################################################################
+# Main
+def main():
+    parser = argparse.ArgumentParser(description="Battle simulation benchmark")
+    parser.add_argument("--heroes", type=int, default=10_000)
+    parser.add_argument("--villains", type=int, default=10_000)
+    parser.add_argument("--trials", type=int, default=1000)
+    parser.add_argument("--sample", type=int, default=500, help="heroes of the Python loops")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    heroes = rng.integers(0, 5000, args.heroes).astype(np.float64)
+    villains = rng.integers(0, 5000, args.villains).astype(np.float64)
+    pairs = args.heroes * args.villains
+
+    expected = timed(simulate, heroes, villains)
+    monte_carlo = timed(simulate, heroes, villains, trials=args.trials, seed=42)
+
+    # The Python loops are timed on a sample of heroes (and villains, for the duels)
+    sample = random.Random(0).sample(heroes.tolist(), min(args.sample, args.heroes))
+    loop = timed(python_loop, sample, villains.tolist()) * args.heroes / len(sample)
+    villains_sample = villains[:max(1, args.villains // 100)].tolist()
+    duels = timed(python_duels, sample[:10], villains_sample, args.trials) * (
+        pairs / (min(10, len(sample)) * len(villains_sample))
+    )
+
+    print(f"{args.heroes} heroes x {args.villains} villains = {pairs:,} matchups")
+    print("Expected mode")
+    print(f"  Python loop (extrapolated): {loop:10.2f} s ({pairs / loop:14,.0f} pairs/s)")
+    print(
+        f"  NumPy:                      {expected:10.2f} s ({pairs / expected:14,.0f} pairs/s,"
+        f" {loop / expected:.0f}x)"
+    )
+    print(f"Monte Carlo mode ({args.trials} trials per matchup)")
+    print(f"  Python loop (extrapolated): {duels:10.2f} s ({pairs / duels:14,.0f} pairs/s)")
+    print(
+        f"  NumPy:                      {monte_carlo:10.2f} s "
+        f"({pairs / monte_carlo:14,.0f} pairs/s, {duels / monte_carlo:.0f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
+###################################################################################################
@@ -0,0 +1,125 @@
+################################################
+# Benchmark: heroes / villains listing by type #
+################################################
+
+###################################################################################################
+# Usage
+#
+#   python -m benchmarks.character_type_listing --rows 1000000
+#
+# Runs against DATABASE_URL (PostgreSQL). The rows are inserted inside a transaction that is
+# rolled back at the end, so the database is left untouched. Each query is timed with and
+# without the ix_character_character_type_character_id index.
+###################################################################################################
+
+###################################################################################################
+# Imports
+import argparse
+import statistics
+import time
+from sqlalchemy import text
+from app.db.database import engine
+###################################################################################################
+
+
+###################################################################################################
+# Queries
+QUERIES = {
+    "first page": (
+        "SELECT * FROM character WHERE character_type = :character_type "
+        "ORDER BY character_id LIMIT 10"
+    ),
+    "deep page (offset)": (
+        "SELECT * FROM character WHERE character_type = :character_type "
+        "ORDER BY character_id OFFSET :offset LIMIT 10"
+    ),
+    "deep page (keyset)": (
+        "SELECT * FROM character WHERE character_type = :character_type "
+        "AND character_id > :after_id ORDER BY character_id LIMIT 10"
+    ),
+}
+###################################################################################################
+
+
+###################################################################################################
+# Helpers
+def seed(connection, rows: int):
+
+    """ Function to insert rows characters, alternating heroes and villains """
+
+    connection.execute(
+        text(
+            "INSERT INTO character (name, secret_name, age, character_type) "
+            "SELECT 'Character ' || n, NULL, n % 100, "
+            "CASE WHEN n % 2 = 0 THEN 'hero' ELSE 'villain' END::charactertype "
+            "FROM generate_series(1, :rows) AS n"
+        ),
+        {"rows": rows}
+    )
+    connection.execute(text("ANALYZE character"))
+
+
+def timed(connection, query: str, params: dict, repeat: int) -> float:
+
+    """ Function to return the median latency (ms) of a query """
+
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(text(query), params).fetchall()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(latencies)
+
+
+def run(connection, rows: int, repeat: int) -> dict:
+
+    """ Function to time every query for heroes and villains """
+
+    max_id = connection.execute(text("SELECT max(character_id) FROM character")).scalar()
+    results = {}
+
+    for character_type in ("hero", "villain"):
+        params = {
+            "character_type": character_type,
+            "offset": rows // 2 - 10,
+            "after_id": max_id - 20,
+        }
+        for name, query in QUERIES.items():
+            results[(character_type, name)] = timed(connection, query, params, repeat)
+
+    return results
+###################################################################################################
+
+
+###################################################################################################
+# Main
+def main():
+    parser = argparse.ArgumentParser(description="Heroes / villains listing benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            seed(connection, args.rows)
+            with_index = run(connection, args.rows, args.repeat)
+
+            connection.execute(text("DROP INDEX IF EXISTS ix_character_character_type_character_id"))
+            without_index = run(connection, args.rows, args.repeat)
+        finally:
+            transaction.rollback()
+
+    print(f"{args.rows} rows, median of {args.repeat} runs (ms)")
+    print(f"{'type':<8} {'query':<20} {'no index':>10} {'index':>10}")
+    for (character_type, name), latency in with_index.items():
+        print(
+            f"{character_type:<8} {name:<20} "
+            f"{without_index[(character_type, name)]:>10.2f} {latency:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
+###################################################################################################
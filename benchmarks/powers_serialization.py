@@ -0,0 +1,93 @@
+################################################
+# Benchmark: JSON serialization of GET /powers #
+################################################
+
+###################################################################################################
+# Usage
+#
+#   python -m benchmarks.powers_serialization --items 1000 --requests 500
+#
+# Serves a page of powers from memory (no database) through two FastAPI apps, called in-process
+# over ASGI: the previous path (jsonable_encoder + JSONResponse) and the current one (direct
+# model serialization + ORJSONResponse, the API's default response class).
+###################################################################################################
+
+###################################################################################################
+# Imports
+import argparse
+import asyncio
+import time
+import httpx
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from app.models import characters, character_power # register the mapped relationships
+from app.models.powers import Powers, PowerPublic
+###################################################################################################
+
+
+###################################################################################################
+# Apps
+def build_app(rows: list[Powers], use_orjson: bool) -> FastAPI:
+
+    """ Function to build an app with a GET /powers endpoint serving rows
+
+        :param list[Powers] rows: the page of powers
+        :param bool use_orjson: serialize like the API does now (else like it did before)
+    """
+
+    if use_orjson:
+        app = FastAPI(default_response_class=ORJSONResponse)
+
+        @app.get("/powers", response_model=list[PowerPublic])
+        async def read_powers():
+            return [PowerPublic.model_validate(power).model_dump(mode="json") for power in rows]
+    else:
+        app = FastAPI(default_response_class=JSONResponse)
+
+        @app.get("/powers", response_model=list[PowerPublic])
+        async def read_powers():
+            return jsonable_encoder([PowerPublic.model_validate(power) for power in rows])
+
+    return app
+
+
+async def requests_per_second(app: FastAPI, requests: int) -> float:
+
+    """ Function to return the throughput of GET /powers on app """
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        await client.get("/powers") # warm up
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get("/powers")
+            response.raise_for_status()
+        return requests / (time.perf_counter() - start)
+###################################################################################################
+
+
+###################################################################################################
+# Main
+def main():
+    parser = argparse.ArgumentParser(description="GET /powers serialization benchmark")
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = [
+        Powers(power_id=i, power_name=f"Power {i}", power_damage=i % 1000, version=1)
+        for i in range(1, args.items + 1)
+    ]
+
+    before = asyncio.run(requests_per_second(build_app(rows, use_orjson=False), args.requests))
+    after = asyncio.run(requests_per_second(build_app(rows, use_orjson=True), args.requests))
+
+    print(f"GET /powers with {args.items} items, {args.requests} requests")
+    print(f"jsonable_encoder + JSONResponse:  {before:8.1f} req/s")
+    print(f"model_dump + ORJSONResponse:      {after:8.1f} req/s ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
+###################################################################################################
@@ -0,0 +1,61 @@
+##############################################
+# Benchmark: verified-token cache (JWT auth) #
+##############################################
+
+###################################################################################################
+# Usage
+#
+#   SECRET_KEY=... python -m benchmarks.token_cache --iterations 50000
+#
+# Measures the per-request cost of get_current_user's token verification: a full HS256
+# jwt.decode on every call (no cache) versus decode_token with the token already cached.
+###################################################################################################
+
+###################################################################################################
+# Imports
+import argparse
+import time
+import jwt
+from datetime import timedelta
+from app.auth.auth import get_access_token, decode_token, SECRET_KEY, ALGORITHM
+###################################################################################################
+
+
+###################################################################################################
+# Helpers
+def per_call_microseconds(func, token: str, iterations: int) -> float:
+
+    """ Function to return the mean time (µs) of func(token) """
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(token)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def decode_without_cache(token: str) -> dict:
+    return jwt.decode(jwt=token, key=SECRET_KEY, algorithms=[ALGORITHM])
+###################################################################################################
+
+
+###################################################################################################
+# Main
+def main():
+    parser = argparse.ArgumentParser(description="Verified-token cache benchmark")
+    parser.add_argument("--iterations", type=int, default=50_000)
+    args = parser.parse_args()
+
+    token = get_access_token({"sub": "benchmark"}, expiration=timedelta(minutes=30))
+    decode_token(token) # warm the cache
+
+    without_cache = per_call_microseconds(decode_without_cache, token, args.iterations)
+    with_cache = per_call_microseconds(decode_token, token, args.iterations)
+
+    print(f"{args.iterations} calls with the same token")
+    print(f"no cache:   {without_cache:8.2f} µs / request")
+    print(f"with cache: {with_cache:8.2f} µs / request ({without_cache / with_cache:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
+###################################################################################################